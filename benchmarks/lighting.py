@@ -0,0 +1,125 @@
+"""GPU benchmark of the lighting pass: frame time against the number of spotlights.
+
+    python -m benchmarks.lighting --lights 1,16,64,128,239 --size 1280x720 --out lighting.json
+
+Renders the gallery (scenario 3, with a synthetic statue on every pedestal)
+offscreen through EGL, like render_headless.py, lit by N of the pedestal
+spotlights. Each light count is drawn once with the fragment shader
+looping over every active light and once with the clustered light lists
+(engine.clustering), and the frame time is measured up to glFinish. The
+CPU time of the cluster assignment is reported too. Results use the JSON
+format of benchmarks.run, so --compare works the same way.
+"""
+import os
+
+# PyOpenGL chooses its platform on first import
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ.setdefault('EGL_PLATFORM', 'surfaceless')  # Mesa: no X11/Wayland needed
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+
+import numpy as np
+from OpenGL.GL import *
+
+from benchmarks.run import DATA_DIR, _describe, _format_time, compare, environment, measure
+from benchmarks.synthetic import synthetic_obj
+from engine.gallery import Gallery
+from engine.offscreen import OffscreenTarget, create_egl_context
+from engine.scene import Scene
+from engine.shader import Shader
+from main import SHADERS_DIR, init_opengl
+
+
+def build_scene(args):
+    path = synthetic_obj(args.data_dir, args.triangles, True, args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scene = Scene(os.path.dirname(path), load_workers=1, background_loading=False, vertex_format='compact')
+        scene.load_models(names=[os.path.basename(path)])
+        gallery = Gallery(len(scene.meshes), pedestals=args.pedestals, seed=args.seed)
+        scene.set_gallery(gallery)
+        scene.finish_loading()
+        scene.toggle_light_mode(Scene.LIGHT_MODE_SPOTLIGHTS)
+    return scene, gallery.spotlights()
+
+
+def bench_lighting(scene, spotlights, shader, target, light_counts, repeat, seed):
+    rng = np.random.default_rng(seed)
+    width, height = target.width, target.height
+
+    def frame():
+        scene.update(0.0)
+        target.bind()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        scene.render(shader, width, height)
+        glFinish()
+
+    for count in light_counts:
+        chosen = np.sort(rng.choice(len(spotlights), min(count, len(spotlights)), replace=False))
+        with contextlib.redirect_stdout(io.StringIO()):
+            scene.spotlights.clear()
+        scene.spotlights.add(*[spotlights[i] for i in chosen])
+        params = {'lights': len(chosen), 'size': f"{width}x{height}"}
+        for clustered in (False, True):
+            scene.clustered_lighting = clustered
+            frame()  # warm up: cluster upload, instance culling
+            yield "lighting.frame", dict(params, clustered=clustered), measure(frame, repeat)
+        clusters = scene.light_clusters
+        view = scene.camera.get_view_matrix()
+        yield "lighting.assign_clusters", dict(params, clusters=clusters.cluster_count), measure(
+            lambda: clusters.assign(view, scene.fov, width / height, scene.near_plane, scene.far_plane),
+            repeat, number=5)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Frame time against light count, per-fragment loop vs clusters.")
+    parser.add_argument("--lights", default="1,16,64,128,239", help="comma-separated spotlight counts")
+    parser.add_argument("--size", default="1280x720", help="frame size, WIDTHxHEIGHT")
+    parser.add_argument("--samples", type=int, default=4, help="MSAA samples (1 disables)")
+    parser.add_argument("--pedestals", type=int, default=240, help="gallery pedestals (one spotlight each)")
+    parser.add_argument("--triangles", type=int, default=20_000, help="triangles of the synthetic statue")
+    parser.add_argument("--repeat", type=int, default=5, help="timed frames per configuration")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the model and the light selection")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where generated .obj files are kept")
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON file from an earlier run to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    create_egl_context()
+    init_opengl()
+    target = OffscreenTarget(width, height, args.samples)
+    glViewport(0, 0, width, height)
+    shader = Shader(os.path.join(SHADERS_DIR, "vertex.glsl"), os.path.join(SHADERS_DIR, "fragment.glsl"))
+    scene, spotlights = build_scene(args)
+    counts = [int(n) for n in args.lights.split(",") if n.strip()]
+
+    results = []
+    for name, params, timing in bench_lighting(scene, spotlights, shader, target, counts, args.repeat, args.seed):
+        results.append(dict(name=name, params=params, **timing))
+        print(f"{name:<26} {_describe(params):<48} {_format_time(timing['median_s'])}", flush=True)
+    scene.cleanup()
+
+    env = environment()
+    env['renderer'] = glGetString(GL_RENDERER).decode()
+    report = {'environment': env, 'results': results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""CPU micro-benchmarks for the loader and math paths; no GL context needed.
+
+    python -m benchmarks.run --sizes 10k,100k,1m --out bench.json
+    python -m benchmarks.run --compare bench.json   # ratios against an older run
+
+Covers Mesh.load_obj (with the GPU upload stubbed out, plus its peak RSS
+against the file size, measured in a fresh process), _normalize_positions,
+_compute_normals, LOD simplification, vertex cache reordering, BVH frustum
+culling, clustered light assignment, Room geometry generation,
+engine.transform and the Camera's cached view matrix. Results are
+written as JSON; every entry has min/median/mean seconds per call.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.synthetic import statue_mesh, synthetic_obj
+from engine import lod, vertex_cache
+from engine.camera import Camera
+from engine.clustering import LightClusters
+from engine.culling import BVH, aabbs_in_frustum, frustum_planes
+from engine.light import LightBuffer, SpotLight, SpotLightManager
+from engine.mesh import Mesh
+from engine.room import Room
+from engine.transform import look_at, normal_matrix, perspective, rotate_y, translate
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "benchmarks", ".data")
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS report
+    resource = None
+
+
+class _ParseOnlyMesh(Mesh):
+    """Mesh whose GPU upload is a no-op, so load_obj measures parsing only."""
+
+    def upload(self, vertex_data, index_data):
+        self.index_count = len(index_data)
+
+
+def measure(fn, repeat, number=1, setup=None):
+    """Time fn over `repeat` runs of `number` calls; returns seconds per call."""
+    runs = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        runs.append((time.perf_counter() - start) / number)
+    return {
+        'repeat': repeat,
+        'number': number,
+        'min_s': min(runs),
+        'median_s': statistics.median(runs),
+        'mean_s': statistics.fmean(runs),
+        'runs_s': runs,
+    }
+
+
+def _peak_rss():
+    """Peak RSS of this process in bytes.
+
+    VmHWM where /proc has it: Linux carries ru_maxrss over from the parent
+    through fork and exec, so a spawned worker would report our own peak.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _load_peak_rss(path):
+    """Load path in this process; returns (seconds, peak RSS before, peak RSS after) in bytes."""
+    before = _peak_rss()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _ParseOnlyMesh().load_obj(path)
+    seconds = time.perf_counter() - start
+    return seconds, before, _peak_rss()
+
+
+def measure_peak_rss(path):
+    """One load of path in a freshly spawned process, with the RSS it added over the file size."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        seconds, before, peak = pool.submit(_load_peak_rss, path).result()
+    return {
+        'repeat': 1,
+        'number': 1,
+        'min_s': seconds,
+        'median_s': seconds,
+        'mean_s': seconds,
+        'runs_s': [seconds],
+        'baseline_rss_bytes': before,
+        'peak_rss_bytes': peak,
+        'peak_rss_per_file_byte': (peak - before) / os.path.getsize(path),
+    }
+
+
+def bench_transforms(repeat):
+    eye, target, up = [1.0, 2.0, 3.0], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0]
+    model = translate(0.0, 0.15, 0.0) @ rotate_y(30.0)
+    out4, out3 = np.empty((4, 4), dtype=np.float32), np.empty((3, 3), dtype=np.float32)
+    yield "transform.look_at", {}, measure(lambda: look_at(eye, target, up), repeat, number=10_000)
+    yield "transform.look_at", {'out': True}, measure(lambda: look_at(eye, target, up, out=out4), repeat, number=10_000)
+    yield "transform.perspective", {}, measure(lambda: perspective(45.0, 16 / 9, 0.1, 100.0), repeat, number=10_000)
+    yield "transform.normal_matrix", {}, measure(lambda: normal_matrix(model), repeat, number=10_000)
+    yield "transform.normal_matrix", {'out': True}, measure(lambda: normal_matrix(model, out=out3), repeat,
+                                                            number=10_000)
+    camera = Camera()
+    yield "camera.view_matrix", {'moving': False}, measure(camera.get_view_matrix, repeat, number=10_000)
+    yield "camera.view_matrix", {'moving': True}, measure(
+        lambda: (camera.rotate(1.0, 0.0), camera.get_view_matrix()), repeat, number=10_000)
+
+
+def bench_room(repeat):
+    room = object.__new__(Room)  # geometry only; __init__ would upload it
+    for segments in (40, 256, 4096):
+        params = {'segments': segments}
+        yield "room.build_geometry", params, measure(
+            lambda: room._build_geometry(6.0, 4.0, 0.6, 0.15, segments), repeat, number=10)
+
+
+def bench_culling(repeat, seed):
+    """Random boxes in a 100-unit cube, seen from its center."""
+    rng = np.random.default_rng(seed)
+    clip = perspective(45.0, 16 / 9, 0.1, 100.0) @ look_at([0.0, 0.0, 0.0], [1.0, 0.2, 0.5], [0.0, 1.0, 0.0])
+    planes = frustum_planes(clip)
+    for count in (1_000, 10_000, 100_000):
+        centers = rng.uniform(-50.0, 50.0, (count, 3))
+        extents = rng.uniform(0.1, 2.0, (count, 3))
+        bounds = np.stack([centers - extents, centers + extents], axis=1)
+        bvh = BVH(bounds)
+        params = {'boxes': count, 'visible': int(bvh.cull(planes).sum())}
+        yield "culling.bvh_build", params, measure(lambda: BVH(bounds), repeat)
+        yield "culling.bvh_refit", params, measure(lambda: bvh.refit(bounds), repeat)
+        yield "culling.bvh_cull", params, measure(lambda: bvh.cull(planes), repeat, number=10)
+        yield "culling.brute_force", params, measure(lambda: aabbs_in_frustum(bounds, planes), repeat, number=10)
+
+
+def bench_clustering(repeat, seed):
+    """Spotlights pointing down over a 50-unit hall, seen from one side."""
+    rng = np.random.default_rng(seed)
+    view = look_at([0.0, 8.0, 30.0], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+    for count in (16, 64, SpotLightManager.MAX_SPOTLIGHTS):
+        light_buffer = LightBuffer()
+        manager = SpotLightManager(light_buffer)
+        positions = rng.uniform([-25.0, 2.0, -25.0], [25.0, 3.0, 25.0], (count, 3))
+        manager.add(*[SpotLight(p, (0.0, -1.0, 0.0), radius=5.0) for p in positions.tolist()])
+        light_buffer.set_range(SpotLightManager.FIRST_SLOT, count)
+        clusters = LightClusters(light_buffer)
+        params = {'lights': count, 'clusters': clusters.cluster_count}
+        yield "clustering.assign", params, measure(
+            lambda: clusters.assign(view, 45.0, 16 / 9, 0.1, 100.0), repeat, number=10)
+
+
+def bench_mesh(triangles, repeat, data_dir, seed):
+    positions, faces = statue_mesh(triangles, seed)
+    indices = faces.astype(np.uint32).ravel()
+    mesh = Mesh()
+    params = {'triangles': len(faces), 'vertices': len(positions)}
+
+    yield "mesh.normalize_positions", params, measure(lambda: mesh._normalize_positions(positions), repeat)
+    for weighting, crease in (('area', None), ('angle', None), ('area', 45.0)):
+        mesh = Mesh(normal_weighting=weighting, crease_angle=crease)
+        yield "mesh.compute_normals", dict(params, weighting=weighting, crease_angle=crease), measure(
+            lambda: mesh._compute_normals(positions, indices), repeat)
+
+    yield "lod.simplify", dict(params, target=len(faces) // 4), measure(
+        lambda: lod.simplify(positions, indices, len(faces) // 4), repeat)
+
+    yield "vertex_cache.tipsify", params, measure(
+        lambda: vertex_cache.tipsify(indices, len(positions)), repeat)
+
+    for with_normals in (True, False):
+        path = synthetic_obj(data_dir, triangles, with_normals, seed)
+        file_params = dict(params, vn=with_normals, file_bytes=os.path.getsize(path))
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure(lambda: _ParseOnlyMesh().load_obj(path), repeat)
+        yield "mesh.load_obj", file_params, result
+        if resource is not None:
+            yield "mesh.load_obj_memory", file_params, measure_peak_rss(path)
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def repeat_for(triangles, repeat):
+    # Fewer runs for the big meshes so a full suite stays in minutes
+    return max(1, min(repeat, 3_000_000 // max(triangles, 1)))
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def result_key(entry):
+    params = entry['params']
+    return entry['name'] + json.dumps(params, sort_keys=True)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {result_key(e): e for e in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path} (median, new / old):")
+    for entry in results:
+        old = baseline.get(result_key(entry))
+        if old is None:
+            continue
+        if old.get('peak_rss_per_file_byte') and 'peak_rss_per_file_byte' in entry:
+            ratio = entry['peak_rss_per_file_byte'] / old['peak_rss_per_file_byte']
+            flag = "  <-- more memory" if ratio > 1.10 else ""
+        else:
+            ratio = entry['median_s'] / old['median_s']
+            flag = "  <-- slower" if ratio > 1.10 else ""
+        print(f"  {entry['name']:<26} {_describe(entry['params']):<48} {ratio:6.2f}x{flag}")
+
+
+def _describe(params):
+    return " ".join(f"{k}={v}" for k, v in params.items() if k not in ('vertices', 'file_bytes'))
+
+
+def _format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.2f} us"
+    if seconds < 1.0:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.3f} s "
+
+
+def _format_memory(timing):
+    if 'peak_rss_bytes' not in timing:
+        return ""
+    added = timing['peak_rss_bytes'] - timing['baseline_rss_bytes']
+    return f"  peak RSS +{added / 2 ** 20:.0f} MiB = {timing['peak_rss_per_file_byte']:.2f}x file"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CPU benchmarks for the OBJ loader and math helpers.")
+    parser.add_argument("--sizes", default="10k,100k,1m",
+                        help="comma-separated triangle counts for the mesh benchmarks (10m is supported)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic models")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where generated .obj files are kept")
+    parser.add_argument("--only", default=None, help="run only benchmarks whose name contains this text")
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON file from an earlier run to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+
+    groups = [bench_transforms(args.repeat), bench_room(args.repeat), bench_culling(args.repeat, args.seed),
+              bench_clustering(args.repeat, args.seed)]
+    groups += [bench_mesh(n, repeat_for(n, args.repeat), args.data_dir, args.seed) for n in sizes]
+
+    results = []
+    for group in groups:
+        for name, params, timing in group:
+            if args.only and args.only not in name:
+                continue
+            results.append(dict(name=name, params=params, **timing))
+            print(f"{name:<26} {_describe(params):<48} {_format_time(timing['median_s'])}{_format_memory(timing)}",
+                  flush=True)
+
+    report = {'environment': environment(), 'results': results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
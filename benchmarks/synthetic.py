@@ -0,0 +1,91 @@
+"""Deterministic synthetic OBJ models for the benchmarks.
+
+The meshes are statue-like: a latitude/longitude sphere, stretched
+vertically and displaced by a few seeded low-frequency waves so the
+normals vary like a scanned model. The same (triangles, seed) always
+produces byte-identical files.
+"""
+import os
+import numpy as np
+
+
+def statue_mesh(triangles, seed=0):
+    """Return (positions, faces) with about `triangles` triangles.
+
+    positions is float32 (N, 3); faces is int64 (M, 3), 0-based.
+    """
+    # rings * segments grid plus two poles: 2 * segments * (rings - 1) triangles
+    rings = max(3, int(round(np.sqrt(triangles / 4.0))) + 1)
+    segments = 2 * rings
+
+    rng = np.random.default_rng(seed)
+    theta = np.linspace(0.0, np.pi, rings + 1)[1:-1]             # latitude, poles excluded
+    phi = np.linspace(0.0, 2 * np.pi, segments, endpoint=False)  # longitude
+    t, p = np.meshgrid(theta, phi, indexing='ij')
+    radius = np.ones_like(t)
+    for _ in range(6):
+        freq_t, freq_p = rng.integers(1, 7, size=2)
+        phase_t, phase_p = rng.uniform(0, 2 * np.pi, size=2)
+        radius += rng.uniform(0.03, 0.12) * np.sin(freq_t * t + phase_t) * np.cos(freq_p * p + phase_p)
+
+    ring_pos = np.stack([radius * np.sin(t) * np.cos(p),
+                         1.8 * radius * np.cos(t),
+                         radius * np.sin(t) * np.sin(p)], axis=-1).reshape(-1, 3)
+    poles = np.array([[0.0, 1.8, 0.0], [0.0, -1.8, 0.0]])
+    positions = np.vstack([ring_pos, poles]).astype(np.float32)
+    top, bottom = len(ring_pos), len(ring_pos) + 1
+
+    grid = np.arange(len(ring_pos)).reshape(rings - 1, segments)
+    a = grid[:-1]
+    b = np.roll(grid[:-1], -1, axis=1)
+    c = grid[1:]
+    d = np.roll(grid[1:], -1, axis=1)
+    body = np.concatenate([np.stack([a, b, c], axis=-1).reshape(-1, 3),
+                           np.stack([b, d, c], axis=-1).reshape(-1, 3)])
+    first, last = grid[0], grid[-1]
+    cap_top = np.stack([np.full(segments, top), np.roll(first, -1), first], axis=1)
+    cap_bottom = np.stack([np.full(segments, bottom), last, np.roll(last, -1)], axis=1)
+    faces = np.concatenate([cap_top, body, cap_bottom]).astype(np.int64)
+    return positions, faces
+
+
+def vertex_normals(positions, faces):
+    """Area-weighted vertex normals, computed independently of engine.mesh."""
+    p = positions.astype(np.float64)
+    face_n = np.cross(p[faces[:, 1]] - p[faces[:, 0]], p[faces[:, 2]] - p[faces[:, 0]])
+    corner_v = faces.ravel()
+    corner_n = np.repeat(face_n, 3, axis=0)
+    normals = np.stack([np.bincount(corner_v, corner_n[:, k], minlength=len(p)) for k in range(3)], axis=1)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return (normals / np.where(lengths > 0, lengths, 1.0)).astype(np.float32)
+
+
+def write_obj(path, positions, faces, normals=None, chunk=1 << 18):
+    """Write an OBJ file; faces are written as v//vn when normals are given."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(f"# synthetic statue: {len(positions)} vertices, {len(faces)} triangles\n")
+        for start in range(0, len(positions), chunk):
+            np.savetxt(f, positions[start:start + chunk], fmt="v %.6f %.6f %.6f")
+        if normals is not None:
+            for start in range(0, len(normals), chunk):
+                np.savetxt(f, normals[start:start + chunk], fmt="vn %.6f %.6f %.6f")
+        face_fmt = "f %d//%d %d//%d %d//%d" if normals is not None else "f %d %d %d"
+        for start in range(0, len(faces), chunk):
+            refs = faces[start:start + chunk] + 1
+            if normals is not None:
+                refs = np.repeat(refs, 2, axis=1)
+            np.savetxt(f, refs, fmt=face_fmt)
+    os.replace(tmp_path, path)
+
+
+def synthetic_obj(data_dir, triangles, with_normals, seed=0):
+    """Path of a generated statue OBJ, writing it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    kind = "vn" if with_normals else "novn"
+    path = os.path.join(data_dir, f"statue_{triangles}_{kind}_s{seed}.obj")
+    if not os.path.exists(path):
+        positions, faces = statue_mesh(triangles, seed)
+        normals = vertex_normals(positions, faces) if with_normals else None
+        write_obj(path, positions, faces, normals)
+    return path
@@ -2,35 +2,97 @@ import math
 import numpy as np
 from engine.transform import look_at
 
+UP = (0.0, 1.0, 0.0)
+
 
 class Camera:
+    """Orbit camera around target.
+
+    Position and view matrix are kept in preallocated arrays and rebuilt only
+    when yaw, pitch, distance or target changed (rotate, zoom or direct
+    assignment set the dirty flag); version counts those changes. The
+    returned arrays are updated in place, so copy them to keep an old value.
+    """
+
     def __init__(self, target=(0, 0, 0), distance=3.0, yaw=-90.0, pitch=20.0):
-        self.target = np.array(target, dtype=np.float32)
-        self.distance = distance
-        self.yaw = yaw
-        self.pitch = pitch
+        self._target = np.array(target, dtype=np.float32)
+        self._distance = distance
+        self._yaw = yaw
+        self._pitch = pitch
         self.min_distance = 0.5
         self.max_distance = 5.5
         self.min_pitch = -89.0
         self.max_pitch = 89.0
         self.sensitivity = 0.3
         self.zoom_speed = 0.5
+        self.version = 0
+        self._position = np.zeros(3, dtype=np.float32)
+        self._view = np.eye(4, dtype=np.float32)
+        self._dirty = True
+
+    def _set(self, name, value):
+        if getattr(self, name) != value:
+            setattr(self, name, value)
+            self._dirty = True
+            self.version += 1
+
+    @property
+    def yaw(self):
+        return self._yaw
+
+    @yaw.setter
+    def yaw(self, value):
+        self._set('_yaw', value)
+
+    @property
+    def pitch(self):
+        return self._pitch
+
+    @pitch.setter
+    def pitch(self, value):
+        self._set('_pitch', value)
+
+    @property
+    def distance(self):
+        return self._distance
+
+    @distance.setter
+    def distance(self, value):
+        self._set('_distance', value)
+
+    @property
+    def target(self):
+        return self._target
+
+    @target.setter
+    def target(self, value):
+        self._target[:] = value
+        self._dirty = True
+        self.version += 1
+
+    def _update(self):
+        if not self._dirty:
+            return
+        pitch, yaw = math.radians(self._pitch), math.radians(self._yaw)
+        self._position[0] = self._distance * math.cos(pitch) * math.cos(yaw)
+        self._position[1] = self._distance * math.sin(pitch)
+        self._position[2] = self._distance * math.cos(pitch) * math.sin(yaw)
+        self._position += self._target
+        look_at(self._position, self._target, UP, out=self._view)
+        self._dirty = False
 
     @property
     def position(self):
-        x = self.distance * math.cos(math.radians(self.pitch)) * math.cos(math.radians(self.yaw))
-        y = self.distance * math.sin(math.radians(self.pitch))
-        z = self.distance * math.cos(math.radians(self.pitch)) * math.sin(math.radians(self.yaw))
-        return self.target + np.array([x, y, z], dtype=np.float32)
+        self._update()
+        return self._position
 
     def get_view_matrix(self):
-        return look_at(self.position, self.target, [0.0, 1.0, 0.0])
+        self._update()
+        return self._view
 
     def rotate(self, dx, dy):
-        self.yaw += dx * self.sensitivity
-        self.pitch += dy * self.sensitivity
-        self.pitch = max(self.min_pitch, min(self.max_pitch, self.pitch))
+        self.yaw = self._yaw + dx * self.sensitivity
+        self.pitch = max(self.min_pitch, min(self.max_pitch, self._pitch + dy * self.sensitivity))
 
     def zoom(self, amount):
-        self.distance -= amount * self.zoom_speed
-        self.distance = max(self.min_distance, min(self.max_distance, self.distance))
+        self.distance = max(self.min_distance, min(self.max_distance, self._distance - amount * self.zoom_speed))
@@ -0,0 +1,222 @@
+import math
+import numpy as np
+from OpenGL.GL import *
+
+
+def _plane_distances(centers, tangents):
+    """Signed distances of view-space points to the planes x = -z * k through
+    the eye (one column per tangent k); positive on the +x side."""
+    norm = np.sqrt(1.0 + tangents * tangents)
+    return (centers[:, 0:1] + centers[:, 2:3] * tangents) / norm
+
+
+def light_spheres(lights):
+    """Bounding sphere (center, radius) of each point/spot light's lit volume.
+
+    A spotlight (cutoff > 0) lights a cone of its radius around direction;
+    lights without a cone light the whole sphere.
+    """
+    position = lights['position'].astype(np.float64)
+    direction = lights['direction'].astype(np.float64)
+    radius = lights['radius'].astype(np.float64)
+    cos = np.clip(lights['outer_cutoff'].astype(np.float64), 0.0, 1.0)
+    sin = np.sqrt(1.0 - cos * cos)
+    cone = lights['cutoff'] > 0.0
+    # Narrow cones (<= 45 degrees) fit a sphere through the apex and the cap
+    # rim; wider ones a sphere around the cap
+    narrow = cone & (cos >= math.sqrt(0.5))
+    wide = cone & ~narrow
+    center = position.copy()
+    sphere = radius.copy()
+    half = radius[narrow] / (2.0 * cos[narrow] * cos[narrow])
+    center[narrow] += direction[narrow] * half[:, None]
+    sphere[narrow] = half
+    center[wide] += direction[wide] * (radius[wide] * cos[wide])[:, None]
+    sphere[wide] = radius[wide] * sin[wide]
+    return center, sphere
+
+
+class LightClusters:
+    """Clustered light assignment for fragment.glsl.
+
+    The view frustum is split into tiles[0] x tiles[1] screen tiles and
+    tiles[2] depth slices (exponential, so near clusters are thin). assign()
+    finds the lights touching each cluster with NumPy: the light's bounding
+    sphere is tested against the tile columns, rows and slices separately,
+    the box of clusters spanned by the three runs gives the candidates, and
+    spotlights are then tested against each candidate's bounding sphere
+    with their actual cone. Directional lights go into every cluster.
+
+    Per cluster (offset, count) into a flat light index list; both live in
+    texture buffers, which a GL 3.3 shader reads with texelFetch. update()
+    reassigns and uploads only when the lights, the camera or the viewport
+    changed.
+    """
+    GRID_UNIT = 2   # texture units of the two texture buffers
+    INDEX_UNIT = 3
+
+    def __init__(self, light_buffer, tiles=(16, 9, 24)):
+        self.light_buffer = light_buffer
+        self.tiles = tuple(tiles)
+        self.grid = None     # (clusters, 2) uint32: offset, count
+        self.indices = None  # uint16 light slots
+        self._key = None
+        self._frustum_key = None
+        self._buffers = None   # (grid buffer, index buffer)
+        self._textures = None  # (grid texture, index texture)
+        self._index_capacity = 0
+
+    @property
+    def cluster_count(self):
+        return self.tiles[0] * self.tiles[1] * self.tiles[2]
+
+    def _setup_frustum(self, fov, aspect, near, far):
+        """Tile plane tangents, slice depths and cluster bounding spheres, per projection."""
+        key = (fov, aspect, near, far)
+        if key == self._frustum_key:
+            return
+        nx, ny, nz = self.tiles
+        tan_y = math.tan(math.radians(fov) / 2.0)
+        tan_x = tan_y * aspect
+        self.x_tangents = (2.0 * np.arange(nx + 1) / nx - 1.0) * tan_x
+        self.y_tangents = (2.0 * np.arange(ny + 1) / ny - 1.0) * tan_y
+        self.slice_depths = near * (far / near) ** (np.arange(nz + 1) / nz)
+        # View-space AABB of every cluster (z, y, x order, as the grid)
+        d0 = self.slice_depths[:-1][:, None, None]
+        d1 = self.slice_depths[1:][:, None, None]
+        kx0, kx1 = self.x_tangents[:-1][None, None, :], self.x_tangents[1:][None, None, :]
+        ky0, ky1 = self.y_tangents[:-1][None, :, None], self.y_tangents[1:][None, :, None]
+        x_lo = np.minimum(kx0 * d0, kx0 * d1)
+        x_hi = np.maximum(kx1 * d0, kx1 * d1)
+        y_lo = np.minimum(ky0 * d0, ky0 * d1)
+        y_hi = np.maximum(ky1 * d0, ky1 * d1)
+        shape = (nz, ny, nx)
+        lo = np.stack([np.broadcast_to(x_lo, shape), np.broadcast_to(y_lo, shape), np.broadcast_to(-d1, shape)], -1)
+        hi = np.stack([np.broadcast_to(x_hi, shape), np.broadcast_to(y_hi, shape), np.broadcast_to(-d0, shape)], -1)
+        self.cluster_centers = ((lo + hi) * 0.5).reshape(-1, 3)
+        self.cluster_radii = (np.linalg.norm(hi - lo, axis=-1) * 0.5).ravel()
+        self.near, self.far = near, far
+        self._frustum_key = key
+
+    def assign(self, view, fov, aspect, near, far, slots=None):
+        """Fill self.grid and self.indices for the lights in slots (default: the
+        LightBuffer's active range) seen through view."""
+        self._setup_frustum(fov, aspect, near, far)
+        if slots is None:
+            first, count = self.light_buffer.active_range
+            slots = np.arange(first, first + count)
+        slots = np.asarray(slots, dtype=np.int64)
+        lights = self.light_buffer.lights[slots]
+        directional = lights['type'] == 0
+        local = slots[~directional]
+        local_lights = lights[~directional]
+
+        center, radius = light_spheres(local_lights)
+        view = np.asarray(view, dtype=np.float64)
+        center = center @ view[:3, :3].T + view[:3, 3]
+        r = radius[:, None]
+        dx = _plane_distances(center, self.x_tangents)
+        x_mask = (dx[:, :-1] >= -r) & (dx[:, 1:] <= r)
+        dy = _plane_distances(center[:, [1, 0, 2]], self.y_tangents)
+        y_mask = (dy[:, :-1] >= -r) & (dy[:, 1:] <= r)
+        depth = -center[:, 2:3]
+        z_mask = (depth - r <= self.slice_depths[None, 1:]) & (depth + r >= self.slice_depths[None, :-1])
+        # Each mask row is one run of tiles/slices: expand every light's box of
+        # clusters without going through all clusters x all lights
+        nx, ny, _ = self.tiles
+        (x0, w), (y0, h), (z0, d) = [(m.argmax(axis=1), m.sum(axis=1)) for m in (x_mask, y_mask, z_mask)]
+        sizes = w * h * d
+        light = np.repeat(np.arange(len(local)), sizes)
+        offset = np.arange(len(light)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        x = x0[light] + offset % w[light]
+        rest = offset // w[light]
+        y = y0[light] + rest % h[light]
+        z = z0[light] + rest // h[light]
+        cluster = (z * ny + y) * nx + x
+
+        cone = np.flatnonzero(local_lights['cutoff'][light] > 0.0)
+        if len(cone):
+            # Cone against the cluster's bounding sphere
+            li, ci = light[cone], cluster[cone]
+            apex = local_lights['position'][li].astype(np.float64) @ view[:3, :3].T + view[:3, 3]
+            axis = local_lights['direction'][li].astype(np.float64) @ view[:3, :3].T
+            cos = np.clip(local_lights['outer_cutoff'][li].astype(np.float64), 0.0, 1.0)
+            sin = np.sqrt(1.0 - cos * cos)
+            v = self.cluster_centers[ci] - apex
+            along = np.einsum('ij,ij->i', v, axis)
+            across = np.sqrt(np.maximum(np.einsum('ij,ij->i', v, v) - along * along, 0.0))
+            sphere_r = self.cluster_radii[ci]
+            outside = (cos * across - along * sin > sphere_r) | (along > sphere_r + local_lights['radius'][li]) | \
+                (along < -sphere_r)
+            keep = np.ones(len(light), dtype=bool)
+            keep[cone[outside]] = False
+            cluster, light = cluster[keep], light[keep]
+
+        light_slots = local[light]
+        if directional.any():
+            # Every cluster lists the directional lights first
+            everywhere = slots[directional]
+            cluster = np.concatenate([np.repeat(np.arange(self.cluster_count), len(everywhere)), cluster])
+            light_slots = np.concatenate([np.tile(everywhere, self.cluster_count), light_slots])
+        order = np.argsort(cluster, kind='stable')  # lights stay in slot order within a cluster
+        light_slots = light_slots[order]
+        counts = np.bincount(cluster, minlength=self.cluster_count)
+        self.grid = np.zeros((self.cluster_count, 2), dtype=np.uint32)
+        self.grid[1:, 0] = np.cumsum(counts)[:-1]
+        self.grid[:, 1] = counts
+        self.indices = light_slots.astype(np.uint16)
+        return self.grid, self.indices
+
+    def update(self, view, fov, aspect, near, far):
+        """Reassign and upload if the lights, the view or the projection changed."""
+        key = (self.light_buffer.version, np.asarray(view).tobytes(), fov, aspect, near, far)
+        if key == self._key:
+            return False
+        self._key = key
+        self.assign(view, fov, aspect, near, far)
+        self._upload()
+        return True
+
+    def _upload(self):
+        if self._buffers is None:
+            self._buffers = tuple(glGenBuffers(2))
+            self._textures = tuple(glGenTextures(2))
+            for texture, buffer, fmt in zip(self._textures, self._buffers, (GL_RG32UI, GL_R16UI)):
+                glBindBuffer(GL_TEXTURE_BUFFER, buffer)
+                glBufferData(GL_TEXTURE_BUFFER, 4, None, GL_DYNAMIC_DRAW)
+                glBindTexture(GL_TEXTURE_BUFFER, texture)
+                glTexBuffer(GL_TEXTURE_BUFFER, fmt, buffer)
+            glBindTexture(GL_TEXTURE_BUFFER, 0)
+        grid_buffer, index_buffer = self._buffers
+        glBindBuffer(GL_TEXTURE_BUFFER, grid_buffer)
+        glBufferData(GL_TEXTURE_BUFFER, self.grid.nbytes, self.grid, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_TEXTURE_BUFFER, index_buffer)
+        if len(self.indices) > self._index_capacity:
+            # Grow with headroom; glTexBuffer follows the buffer's new storage
+            self._index_capacity = max(len(self.indices), 2 * self._index_capacity, 1024)
+            glBufferData(GL_TEXTURE_BUFFER, 2 * self._index_capacity, None, GL_DYNAMIC_DRAW)
+        if len(self.indices):
+            glBufferSubData(GL_TEXTURE_BUFFER, 0, self.indices.nbytes, self.indices)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+
+    def bind(self, shader, width, height):
+        """Bind the texture buffers to GRID_UNIT/INDEX_UNIT and set the cluster
+        uniforms (shader must be in use)."""
+        if self._textures is None:
+            return
+        for unit, texture in ((self.GRID_UNIT, self._textures[0]), (self.INDEX_UNIT, self._textures[1])):
+            glActiveTexture(GL_TEXTURE0 + unit)
+            glBindTexture(GL_TEXTURE_BUFFER, texture)
+        glActiveTexture(GL_TEXTURE0)
+        nx, ny, nz = self.tiles
+        shader.set_ivec3("clusterCount", (nx, ny, nz))
+        shader.set_vec2("clusterScale", (nx / max(width, 1), ny / max(height, 1)))
+        shader.set_vec2("clusterDepth", (self.near, nz / math.log(self.far / self.near)))
+
+    def cleanup(self):
+        if self._buffers is not None:
+            glDeleteBuffers(2, list(self._buffers))
+            glDeleteTextures(list(self._textures))
+            self._buffers = self._textures = None
+            self._index_capacity = 0
+            self._key = None
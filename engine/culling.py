@@ -0,0 +1,150 @@
+import numpy as np
+
+
+def frustum_planes(clip):
+    """The 6 planes (a, b, c, d) of a projection @ view matrix, inside where >= 0.
+
+    Gribb/Hartmann extraction: each clip-space bound -w <= x, y, z <= w is a
+    sum or difference of the matrix's last row and one other row. The planes
+    are not normalized; the tests below only use signs.
+    """
+    clip = np.asarray(clip, dtype=np.float64)
+    w = clip[3]
+    return np.stack([w + clip[0], w - clip[0], w + clip[1], w - clip[1], w + clip[2], w - clip[2]])
+
+
+def transform_aabbs(bounds, matrices):
+    """World AABBs of (N, 2, 3) local boxes under (N, 4, 4) matrices (Arvo's method)."""
+    center = (bounds[:, 0] + bounds[:, 1]) * 0.5
+    extent = (bounds[:, 1] - bounds[:, 0]) * 0.5
+    linear = matrices[:, :3, :3]
+    world_center = np.einsum('nij,nj->ni', linear, center) + matrices[:, :3, 3]
+    world_extent = np.einsum('nij,nj->ni', np.abs(linear), extent)
+    return np.stack([world_center - world_extent, world_center + world_extent], axis=1)
+
+
+def _classify(center, extent, planes):
+    """Per box: (outside, inside) against the frustum, conservative for corners."""
+    dist = center @ planes[:, :3].T + planes[:, 3]
+    radius = extent @ np.abs(planes[:, :3]).T
+    return (dist < -radius).any(axis=1), (dist >= radius).all(axis=1)
+
+
+def aabbs_in_frustum(bounds, planes):
+    """Brute-force visibility of (N, 2, 3) world boxes; the reference for BVH.cull."""
+    center = (bounds[:, 0] + bounds[:, 1]) * 0.5
+    extent = (bounds[:, 1] - bounds[:, 0]) * 0.5
+    outside, _ = _classify(center, extent, planes)
+    return ~outside
+
+
+def _morton_codes(points):
+    """30-bit Z-order codes of points quantized to 1024 steps per axis."""
+    lo = points.min(axis=0)
+    span = np.maximum(points.max(axis=0) - lo, 1e-12)
+    q = ((points - lo) / span * 1023).astype(np.uint64)
+    q = (q | (q << np.uint64(16))) & np.uint64(0x030000FF)
+    q = (q | (q << np.uint64(8))) & np.uint64(0x0300F00F)
+    q = (q | (q << np.uint64(4))) & np.uint64(0x030C30C3)
+    q = (q | (q << np.uint64(2))) & np.uint64(0x09249249)
+    return (q[:, 0] << np.uint64(2)) | (q[:, 1] << np.uint64(1)) | q[:, 2]
+
+
+class BVH:
+    """Bounding-volume hierarchy over world-space boxes, culled in NumPy.
+
+    Items are sorted along a Morton (Z-order) curve of their centers and the
+    tree halves that order recursively, so spatially close boxes share
+    subtrees; it is stored flat, node i covering items order[start[i]:
+    start[i] + count[i]]. Building, refitting and culling all run one tree
+    level at a time in batched NumPy. cull() classifies the whole frontier
+    at once: nodes outside the frustum are dropped, nodes fully inside
+    accept all their items without further tests, and only leaves that
+    straddle a plane test their items one by one.
+    """
+
+    def __init__(self, bounds, leaf_size=4):
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 2, 3)
+        self.item_count = len(bounds)
+        centers = (bounds[:, 0] + bounds[:, 1]) * 0.5
+        self.order = np.argsort(_morton_codes(centers), kind='stable') if self.item_count else np.zeros(0, np.int64)
+        starts, counts, lefts, rights, inner_levels = [], [], [], [], []
+        level_start = np.zeros(1 if self.item_count else 0, dtype=np.int64)
+        level_count = np.full(len(level_start), self.item_count, dtype=np.int64)
+        next_id = 0
+        while len(level_start):
+            ids = np.arange(next_id, next_id + len(level_start))
+            next_id += len(level_start)
+            split = level_count > leaf_size
+            n_split = int(split.sum())
+            left = np.full(len(ids), -1, dtype=np.int64)
+            right = np.full(len(ids), -1, dtype=np.int64)
+            left[split] = next_id + np.arange(n_split)
+            right[split] = next_id + n_split + np.arange(n_split)
+            starts.append(level_start)
+            counts.append(level_count)
+            lefts.append(left)
+            rights.append(right)
+            inner_levels.append(ids[split])
+            half = level_count[split] // 2
+            level_start = np.concatenate([level_start[split], level_start[split] + half])
+            level_count = np.concatenate([half, level_count[split] - half])
+        self.start = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+        self.count = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+        self.left = np.concatenate(lefts) if lefts else np.zeros(0, dtype=np.int64)
+        self.right = np.concatenate(rights) if rights else np.zeros(0, dtype=np.int64)
+        self._inner_levels = inner_levels[::-1]  # deepest first, for refit()
+        leaves = np.flatnonzero(self.left < 0)
+        self._leaves = leaves[np.argsort(self.start[leaves])]  # in item order, for reduceat
+        self.refit(bounds)
+
+    def refit(self, bounds):
+        """Update the tree for new boxes of the same items, keeping its topology."""
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 2, 3)
+        self.item_center = (bounds[:, 0] + bounds[:, 1]) * 0.5
+        self.item_extent = (bounds[:, 1] - bounds[:, 0]) * 0.5
+        if not self.item_count:
+            self._set_node_bounds(np.zeros((0, 3)), np.zeros((0, 3)))
+            return
+        lo = np.empty((len(self.start), 3))
+        hi = np.empty((len(self.start), 3))
+        ordered = bounds[self.order]
+        leaf_starts = self.start[self._leaves]
+        lo[self._leaves] = np.minimum.reduceat(ordered[:, 0], leaf_starts)
+        hi[self._leaves] = np.maximum.reduceat(ordered[:, 1], leaf_starts)
+        for level in self._inner_levels:
+            lo[level] = np.minimum(lo[self.left[level]], lo[self.right[level]])
+            hi[level] = np.maximum(hi[self.left[level]], hi[self.right[level]])
+        self._set_node_bounds(lo, hi)
+
+    def _set_node_bounds(self, lo, hi):
+        self.center = (lo + hi) * 0.5
+        self.extent = (hi - lo) * 0.5
+
+    def cull(self, planes):
+        """Boolean visibility per item (in the order the boxes were given)."""
+        visible_pos = np.zeros(self.item_count + 1, dtype=np.int64)
+        candidates = []  # item positions of straddling leaves
+        frontier = np.zeros(1 if self.item_count else 0, dtype=np.int64)
+        while len(frontier):
+            outside, inside = _classify(self.center[frontier], self.extent[frontier], planes)
+            accepted = frontier[inside]
+            # Fully inside: mark the item range with a +1/-1 pair, summed below
+            np.add.at(visible_pos, self.start[accepted], 1)
+            np.add.at(visible_pos, self.start[accepted] + self.count[accepted], -1)
+            straddling = frontier[~outside & ~inside]
+            is_leaf = self.left[straddling] < 0
+            leaves = straddling[is_leaf]
+            if len(leaves):
+                counts = self.count[leaves]
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                candidates.append(np.repeat(self.start[leaves], counts) + offsets)
+            inner = straddling[~is_leaf]
+            frontier = np.concatenate([self.left[inner], self.right[inner]])
+        visible = np.zeros(self.item_count, dtype=bool)
+        visible[self.order[np.cumsum(visible_pos[:-1]) > 0]] = True
+        if candidates:
+            items = self.order[np.concatenate(candidates)]
+            outside, _ = _classify(self.item_center[items], self.item_extent[items], planes)
+            visible[items[~outside]] = True
+        return visible
@@ -0,0 +1,78 @@
+import time
+
+
+class FrameScheduler:
+    """Decides when the main loop draws a frame.
+
+    A frame is drawn only when something on screen can have changed since
+    the last one: the camera, the lights (LightBuffer.version), the light
+    mode, the active model, the scene graph or the window size, or a redraw
+    was requested (window exposed). While the scene still has work to finish
+    over several frames (models uploading, shadow maps waiting for their
+    budget) frames keep coming. In sun mode the orbiting sun is a change
+    source of its own, at sun_rate updates per second. Frames are never
+    closer than 1 / max_fps.
+
+    Between frames the loop blocks on input (InputHandler.wait) for at most
+    wait_time() seconds, so an untouched viewer in spotlight mode draws
+    nothing and wakes up only every idle_timeout seconds.
+    """
+
+    def __init__(self, max_fps=60.0, sun_rate=30.0, idle_timeout=1.0):
+        self.max_fps = max_fps
+        self.sun_rate = sun_rate  # sun updates per second; None/0 = only with other changes
+        self.idle_timeout = idle_timeout
+        self.frames = 0
+        self._key = None
+        self._redraw = True
+        self._frame_start = None
+        self._last_frame = None  # start time of the last frame drawn
+
+    def request_redraw(self):
+        self._redraw = True
+
+    def _state_key(self, scene, size):
+        return (scene.camera.version, scene.light_buffer.version, scene.light_mode, scene.active_mesh_index,
+                scene.graph.version, tuple(size))
+
+    def _next_frame_time(self, scene, size):
+        """perf_counter time the next frame is wanted at, or None if nothing changed."""
+        if self._last_frame is None:
+            return 0.0
+        earliest = self._last_frame + 1.0 / self.max_fps
+        if self._redraw or scene.has_pending_work() or self._state_key(scene, size) != self._key:
+            return earliest
+        if scene.light_mode == scene.LIGHT_MODE_SUN and self.sun_rate:
+            return max(earliest, self._last_frame + 1.0 / self.sun_rate)
+        return None
+
+    def frame_due(self, scene, size):
+        due = self._next_frame_time(scene, size)
+        return due is not None and time.perf_counter() >= due
+
+    def wait_time(self, scene, size):
+        """Seconds the loop may block waiting for input before the next frame is due."""
+        due = self._next_frame_time(scene, size)
+        if due is None:
+            return self.idle_timeout
+        return min(max(due - time.perf_counter(), 0.0), self.idle_timeout)
+
+    def begin_frame(self):
+        """Start a frame; returns the animation time step in seconds.
+
+        That is the time since the last frame, cut to the longest gap the
+        scheduler leaves while animating, so the sun doesn't jump ahead
+        after a long idle stretch in spotlight mode.
+        """
+        self._frame_start = time.perf_counter()
+        if self._last_frame is None:
+            return 0.0
+        longest = max(self.idle_timeout, 1.0 / self.sun_rate if self.sun_rate else 0.0)
+        return min(self._frame_start - self._last_frame, longest)
+
+    def frame_drawn(self, scene, size):
+        """Record the state a frame was just drawn with (call after rendering)."""
+        self._key = self._state_key(scene, size)
+        self._redraw = False
+        self._last_frame = self._frame_start
+        self.frames += 1
@@ -0,0 +1,90 @@
+import math
+import numpy as np
+from engine.instancing import InstanceBatch
+from engine.light import SpotLight
+from engine.room import Room
+from engine.transform import quat_axis_angle, trs_matrices
+
+
+class Gallery:
+    """The whole model collection at once: a hall with a grid of pedestals.
+
+    Every pedestal and every statue is an instance: one InstanceBatch for
+    the pedestals (the hall Room's pedestal geometry) and one per model,
+    created as soon as that model is uploaded. Statues are assigned to the
+    pedestals in Tab order, repeating the collection to fill the hall, each
+    with a random turn and a slightly varied color. Scene.set_gallery puts
+    the hall in the scene graph and draws the batches.
+    """
+    MAX_CAMERA_PITCH = 35.0  # keeps the orbit camera under the ceiling
+
+    def __init__(self, num_models, pedestals=200, spacing=3.5, pedestal_radius=1.0, pedestal_height=0.15,
+                 hall_height=None, segments=40, geometry=None, seed=0):
+        self.columns = math.ceil(math.sqrt(pedestals))
+        rows = math.ceil(pedestals / self.columns)
+        half = 0.5 * spacing * max(self.columns, rows)
+        if hall_height is None:
+            hall_height = max(4.0, 0.6 * half + 1.0)  # room for the orbit camera (MAX_CAMERA_PITCH)
+        self.hall = Room(size=half, height=hall_height, pedestal_radius=pedestal_radius,
+                         pedestal_height=pedestal_height, segments=segments, with_pedestal=False,
+                         geometry=geometry, name="hall")
+        self.pedestal_top_y = self.hall.pedestal_top_y
+        self.half_size = half
+
+        cell = np.arange(pedestals)
+        self.positions = np.zeros((pedestals, 3), dtype=np.float32)
+        self.positions[:, 0] = (cell % self.columns - (self.columns - 1) / 2.0) * spacing
+        self.positions[:, 2] = (cell // self.columns - (rows - 1) / 2.0) * spacing
+
+        rng = np.random.default_rng(seed)
+        self.yaw = rng.uniform(0.0, 360.0, pedestals)
+        self.colors = np.clip(np.array([0.7, 0.7, 0.75]) + rng.normal(0.0, 0.06, (pedestals, 3)), 0.0, 1.0)
+        self.model_of = cell % max(num_models, 1)  # mesh index shown on each pedestal
+
+        self.pedestals = InstanceBatch(self.hall.pedestal)
+        ones = np.ones((pedestals, 3), dtype=np.float32)
+        identity = np.tile(np.array([0.0, 0.0, 0.0, 1.0], dtype=np.float32), (pedestals, 1))
+        self.pedestals.set_instances(trs_matrices(self.positions, identity, ones), 0.92 * ones)
+        self.statues = {}  # mesh index -> InstanceBatch
+
+    def spotlights(self, height=3.0, intensity=2.0, radius=5.0):
+        """A SpotLight over every pedestal, pointing down at it; too many for
+        shadow maps, so they cast none."""
+        return [SpotLight(position=(x, self.pedestal_top_y + height, z), direction=(0.0, -1.0, 0.0),
+                          intensity=intensity, cutoff=20.0, outer_cutoff=28.0, radius=radius, casts_shadows=False)
+                for x, _, z in self.positions.tolist()]
+
+    @property
+    def batches(self):
+        return [self.pedestals] + list(self.statues.values())
+
+    def add_ready_meshes(self, meshes):
+        """Create the statue batch of every newly uploaded mesh."""
+        for index, mesh in enumerate(meshes):
+            if index in self.statues or not mesh.is_ready:
+                continue
+            cells = np.flatnonzero(self.model_of == index)
+            if not len(cells):
+                continue
+            translations = self.positions[cells].copy()
+            translations[:, 1] = self.pedestal_top_y - mesh.bottom_y
+            rotations = np.stack([quat_axis_angle((0.0, 1.0, 0.0), a) for a in self.yaw[cells]])
+            batch = InstanceBatch(mesh)
+            batch.set_instances(trs_matrices(translations, rotations, np.ones((len(cells), 3))),
+                                self.colors[cells])
+            self.statues[index] = batch
+
+    def update(self, meshes, planes, eye, lod_scale, hysteresis):
+        """Cull and pick LOD levels for every batch; returns (instances, visible)."""
+        self.add_ready_meshes(meshes)
+        total = visible = 0
+        for batch in self.batches:
+            visible += batch.update(planes, eye, lod_scale, hysteresis)
+            total += batch.count
+        return total, visible
+
+    def cleanup(self):
+        for batch in self.batches:
+            batch.cleanup()
+        self.statues.clear()
+        self.hall.cleanup()
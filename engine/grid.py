@@ -1,43 +1,26 @@
 import numpy as np
-from OpenGL.GL import *
-import ctypes
+from engine.static_geometry import StaticGeometry
 
 
 class Grid:
-    def __init__(self, size=8.0, y=-1.0):
-        self.vao = None
-        self.vbo = None
+    def __init__(self, size=8.0, y=-1.0, geometry=None, name="grid"):
+        # Part of a StaticGeometry, possibly shared with the Room; the grid
+        # shader only reads the positions
+        self.owns_geometry = geometry is None
+        self.geometry = geometry if geometry is not None else StaticGeometry()
+        self.part = name
         self._setup(size, y)
 
     def _setup(self, size, y):
         # Simple ground plane quad
-        vertices = np.array([
-            -size, y, -size,
-             size, y, -size,
-             size, y,  size,
-            -size, y, -size,
-             size, y,  size,
-            -size, y,  size,
-        ], dtype=np.float32)
-
-        self.vao = glGenVertexArrays(1)
-        self.vbo = glGenBuffers(1)
-
-        glBindVertexArray(self.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * 4, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-
-        glBindVertexArray(0)
+        corners = np.array([[-size, y, -size], [size, y, -size], [size, y, size], [-size, y, size]],
+                           dtype=np.float32)
+        vertices = np.hstack([corners, np.tile(np.array([0.0, 1.0, 0.0], dtype=np.float32), (4, 1))])
+        self.geometry.add(self.part, vertices, np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32))
 
     def draw(self):
-        glBindVertexArray(self.vao)
-        glDrawArrays(GL_TRIANGLES, 0, 6)
-        glBindVertexArray(0)
+        self.geometry.draw([self.part])
 
     def cleanup(self):
-        if self.vao is not None:
-            glDeleteVertexArrays(1, [self.vao])
-            glDeleteBuffers(1, [self.vbo])
+        if self.owns_geometry:
+            self.geometry.cleanup()
@@ -8,16 +8,32 @@ class InputHandler:
         self.quit_requested = False
         self.key_events = []
         self.scroll_delta = 0
+        self.redraw_requested = False  # window exposed or resized
+        self._waited = []  # event taken off the queue by wait()
+
+    def wait(self, timeout):
+        """Block until an event arrives or timeout seconds pass; the event is
+        handled by the next process_events."""
+        event = pygame.event.wait(max(int(timeout * 1000), 1))
+        if event.type != pygame.NOEVENT:
+            self._waited.append(event)
 
     def process_events(self):
         self.key_events.clear()
         self.scroll_delta = 0
+        self.redraw_requested = False
         dx, dy = 0, 0
 
-        for event in pygame.event.get():
+        events = self._waited + pygame.event.get()
+        self._waited = []
+        for event in events:
             if event.type == pygame.QUIT:
                 self.quit_requested = True
 
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED,
+                                pygame.WINDOWSIZECHANGED, pygame.WINDOWRESTORED):
+                self.redraw_requested = True
+
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left click
                     self.mouse_dragging = True
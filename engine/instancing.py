@@ -0,0 +1,207 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from engine import lod
+from engine.culling import aabbs_in_frustum, transform_aabbs
+from engine.shader import bind_vertex_array, forget_vertex_array
+from engine.transform import normal_matrices
+
+# One row of the instance VBO; matrices are stored column by column, as the
+# mat4/mat3 attributes of vertex.glsl (locations 2-9) read them
+INSTANCE_DTYPE = np.dtype([('model', '<f4', (16,)), ('normal', '<f4', (9,)), ('color', '<f4', (3,))])
+MODEL_LOCATION = 2
+NORMAL_LOCATION = 6
+COLOR_LOCATION = 9
+
+
+class InstanceBatch:
+    """Many copies of one drawable with a single instanced draw per LOD level.
+
+    Per-instance model matrices, normal matrices and colors live in an
+    instance VBO read through divisor-1 attributes, in a VAO of the batch's
+    own that reuses the drawable's vertex/index buffers. update() culls the
+    instances against the frustum and picks a LOD level per instance, all
+    in NumPy; the visible ones are re-uploaded grouped by level only when
+    that selection changed. The Python cost per frame is therefore set by
+    the number of batches and levels, not by the number of instances.
+
+    draw_all() draws every instance, culled or not, from a second instance
+    VBO that holds them all (for shadow maps, whose casters may be off
+    screen).
+
+    The drawable provides bind_vertex_attributes(), draw_instanced(count,
+    level), bounds, bounds_radius, lods and position_offset/position_scale
+    (Mesh and room.Pedestal do).
+    """
+
+    def __init__(self, drawable):
+        self.drawable = drawable
+        self.vao = None
+        self.instance_vbo = None
+        self._source = None  # drawable buffer the VAO was built on
+        self._capacity = 0
+        self.instances = np.zeros(0, dtype=INSTANCE_DTYPE)
+        self.world_bounds = np.zeros((0, 2, 3))
+        self.positions = np.zeros((0, 3))
+        self.radii = np.zeros(0)
+        self.levels = np.zeros(0, dtype=np.int64)
+        self.draw_ranges = []  # (level, first instance, instance count) of the uploaded order
+        self.visible_count = 0
+        self._uploaded = None  # instance order currently in the VBO
+        self.all_vao = None
+        self.all_vbo = None  # every instance, uploaded once per set_instances
+        self._all_source = None
+        self._all_uploaded = False
+
+    @property
+    def count(self):
+        return len(self.instances)
+
+    def set_instances(self, models, colors):
+        """Replace the instances: (N, 4, 4) model matrices and (N, 3) colors."""
+        models = np.asarray(models, dtype=np.float32).reshape(-1, 4, 4)
+        self.instances = np.zeros(len(models), dtype=INSTANCE_DTYPE)
+        self.instances['model'] = models.transpose(0, 2, 1).reshape(-1, 16)
+        self.instances['normal'] = normal_matrices(models).transpose(0, 2, 1).reshape(-1, 9)
+        self.instances['color'] = colors
+        bounds = np.asarray(self.drawable.bounds, dtype=np.float64)
+        whole = np.stack([bounds[:, 0].min(axis=0), bounds[:, 1].max(axis=0)])
+        self.world_bounds = transform_aabbs(np.broadcast_to(whole, (len(models), 2, 3)), models.astype(np.float64))
+        self.positions = models[:, :3, 3].astype(np.float64)
+        self.radii = self.drawable.bounds_radius * np.linalg.norm(models[:, :3, :3], axis=1).max(axis=1)
+        self.levels = np.zeros(len(models), dtype=np.int64)
+        self._uploaded = None
+        self._all_uploaded = False
+
+    def update(self, planes, eye, lod_scale, hysteresis):
+        """Cull, choose LOD levels and upload the visible instances if they changed.
+
+        lod_scale turns (radius / distance)^2 into a triangle budget (see
+        Scene.lod_scale). Returns the number of visible instances.
+        """
+        visible = np.flatnonzero(aabbs_in_frustum(self.world_bounds, planes))
+        lods = self.drawable.lods
+        if len(lods) > 1 and len(visible):
+            distance = np.linalg.norm(self.positions[visible] - eye, axis=1)
+            radius = self.radii[visible]
+            with np.errstate(divide='ignore'):
+                desired = np.where(distance > radius, lod_scale * (radius / distance) ** 2, np.inf)
+            counts = [r[1] // 3 for r in lods]
+            self.levels[visible] = lod.select_levels(counts, self.levels[visible], desired, hysteresis)
+        order = visible[np.argsort(self.levels[visible], kind='stable')]
+        self.visible_count = len(order)
+        key = (order.tobytes(), self.levels[order].tobytes())
+        if key != self._uploaded:
+            self._upload(order)
+            self._uploaded = key
+        return self.visible_count
+
+    def _upload(self, order):
+        data = self.instances[order]
+        if self.instance_vbo is None:
+            self.instance_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        if len(data) > self._capacity:
+            self._capacity = max(len(data), 2 * self._capacity, 16)
+            glBufferData(GL_ARRAY_BUFFER, self._capacity * INSTANCE_DTYPE.itemsize, None, GL_DYNAMIC_DRAW)
+        if len(data):
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        levels, first, counts = np.unique(self.levels[order], return_index=True, return_counts=True)
+        self.draw_ranges = list(zip(levels.tolist(), first.tolist(), counts.tolist()))
+
+    def draw(self):
+        """Issue the instanced draws; the shader must have `instanced` set."""
+        if not self.drawable.is_ready:
+            self._release_vao()  # the drawable's buffers are gone (evicted)
+            return
+        if not self.draw_ranges:
+            return
+        if self.vao is None or self._source != self.drawable.vbo:
+            self._build_vao()
+        bind_vertex_array(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        for level, first, count in self.draw_ranges:
+            # GL 3.3 has no base instance: point the attributes at the level's rows
+            self._point_instance_attributes(first)
+            self.drawable.draw_instanced(count, level)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw_all(self, level=0):
+        """Draw every instance at one LOD level, ignoring the culling."""
+        if not self.drawable.is_ready:
+            self._release_vao()
+            return
+        if not self.count:
+            return
+        if self.all_vbo is None:
+            self.all_vbo = glGenBuffers(1)
+        if not self._all_uploaded:
+            glBindBuffer(GL_ARRAY_BUFFER, self.all_vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, self.instances, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self._all_uploaded = True
+        if self.all_vao is None or self._all_source != self.drawable.vbo:
+            self._delete_vao(self.all_vao)
+            self.all_vao = self._make_vao(self.all_vbo)
+            self._all_source = self.drawable.vbo
+        bind_vertex_array(self.all_vao)
+        self.drawable.draw_instanced(self.count, min(level, max(len(self.drawable.lods) - 1, 0)))
+
+    def _build_vao(self):
+        self._delete_vao(self.vao)
+        self.vao = self._make_vao(self.instance_vbo)
+        self._source = self.drawable.vbo
+
+    def _make_vao(self, instance_vbo):
+        vao = glGenVertexArrays(1)
+        bind_vertex_array(vao)
+        self.drawable.bind_vertex_attributes()
+        glBindBuffer(GL_ARRAY_BUFFER, instance_vbo)
+        locations = list(range(MODEL_LOCATION, MODEL_LOCATION + 4)) + \
+            list(range(NORMAL_LOCATION, NORMAL_LOCATION + 3)) + [COLOR_LOCATION]
+        for location in locations:
+            glEnableVertexAttribArray(location)
+            glVertexAttribDivisor(location, 1)
+        self._point_instance_attributes(0)
+        bind_vertex_array(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return vao
+
+    def _point_instance_attributes(self, first):
+        stride = INSTANCE_DTYPE.itemsize
+        base = first * stride
+        model = base + INSTANCE_DTYPE.fields['model'][1]
+        for column in range(4):
+            glVertexAttribPointer(MODEL_LOCATION + column, 4, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(model + 16 * column))
+        normal = base + INSTANCE_DTYPE.fields['normal'][1]
+        for column in range(3):
+            glVertexAttribPointer(NORMAL_LOCATION + column, 3, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(normal + 12 * column))
+        color = base + INSTANCE_DTYPE.fields['color'][1]
+        glVertexAttribPointer(COLOR_LOCATION, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(color))
+
+    def _release_vao(self):
+        """Drop both VAOs (they reference the drawable's buffers)."""
+        self._delete_vao(self.vao)
+        self._delete_vao(self.all_vao)
+        self.vao = self.all_vao = None
+        self._source = self._all_source = None
+
+    def _delete_vao(self, vao):
+        if vao is not None:
+            forget_vertex_array(vao)
+            glDeleteVertexArrays(1, [vao])
+
+    def cleanup(self):
+        self._release_vao()
+        if self.instance_vbo is not None:
+            glDeleteBuffers(1, [self.instance_vbo])
+            self.instance_vbo = None
+            self._capacity = 0
+            self._uploaded = None
+        if self.all_vbo is not None:
+            glDeleteBuffers(1, [self.all_vbo])
+            self.all_vbo = None
+            self._all_uploaded = False
@@ -1,19 +1,133 @@
 import math
 import numpy as np
+from OpenGL.GL import *
+
+# The whole LightBlock stays under 16 KB, the uniform block size every
+# OpenGL 3.3 driver supports
+MAX_LIGHTS = 240
+# Shadow map layers: the sun plus the first 9 shadow-casting spotlights
+# (engine.shadows); further spotlights are lit without shadows
+MAX_SHADOW_MAPS = 10
+# Point/spot lights fade to zero at their radius; by default where the
+# distance attenuation has brought them down to this much
+LIGHT_THRESHOLD = 0.05
+
+# std140 layout of `struct Light` in fragment.glsl: every vec3 is padded to
+# 16 bytes and shares its slot with the following float
+LIGHT_DTYPE = np.dtype({
+    'names': ['position', 'intensity', 'direction', 'cutoff', 'color', 'outer_cutoff', 'type',
+              'shadow_layer', 'radius'],
+    'formats': [(np.float32, 3), np.float32, (np.float32, 3), np.float32,
+                (np.float32, 3), np.float32, np.int32, np.int32, np.float32],
+    'offsets': [0, 12, 16, 28, 32, 44, 48, 52, 56],
+    'itemsize': 64,
+})
+
+# std140 layout of `uniform LightBlock`; shadow matrices are stored column by
+# column, one per shadow map layer (engine.shadows writes them)
+LIGHT_BLOCK_DTYPE = np.dtype({
+    'names': ['lights', 'shadow_matrices', 'first_light', 'num_lights'],
+    'formats': [(LIGHT_DTYPE, MAX_LIGHTS), (np.float32, (MAX_SHADOW_MAPS, 4, 4)), np.int32, np.int32],
+    'offsets': [0, MAX_LIGHTS * 64, (MAX_LIGHTS + MAX_SHADOW_MAPS) * 64,
+                (MAX_LIGHTS + MAX_SHADOW_MAPS) * 64 + 4],
+    'itemsize': (MAX_LIGHTS + MAX_SHADOW_MAPS) * 64 + 16,
+})
+
+
+def light_radius(intensity, threshold=LIGHT_THRESHOLD):
+    """Distance at which intensity / (1 + 0.09 d + 0.032 d^2) drops to threshold."""
+    c = 1.0 - intensity / threshold
+    if c >= 0.0:
+        return 0.0
+    return (-0.09 + math.sqrt(0.09 * 0.09 - 4.0 * 0.032 * c)) / (2.0 * 0.032)
+
+
+class LightBuffer:
+    """CPU copy of the LightBlock uniform buffer.
+
+    Light sources write straight into `lights` and call mark_dirty();
+    upload() sends the whole block with a single glBufferSubData, and only
+    when something changed. Slot 0 belongs to the sun and the remaining
+    slots to spotlights; first_light/num_lights select the active range.
+    version counts the changes, for engine.clustering.
+    """
+    BINDING = 0
+    BLOCK_NAME = "LightBlock"
+
+    def __init__(self):
+        self.block = np.zeros((), dtype=LIGHT_BLOCK_DTYPE)
+        self.lights = self.block['lights']
+        self.lights['shadow_layer'] = -1  # no shadow map until engine.shadows renders one
+        self.shadow_matrices = self.block['shadow_matrices']
+        self.ubo = None
+        self.dirty = True
+        self.version = 0
+
+    def mark_dirty(self):
+        self.dirty = True
+        self.version += 1
+
+    @property
+    def active_range(self):
+        return int(self.block['first_light']), int(self.block['num_lights'])
+
+    def set_range(self, first, count):
+        if self.block['first_light'] != first or self.block['num_lights'] != count:
+            self.block['first_light'] = first
+            self.block['num_lights'] = count
+            self.mark_dirty()
+
+    def upload(self):
+        if self.ubo is None:
+            self.ubo = glGenBuffers(1)
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, self.block.nbytes, None, GL_DYNAMIC_DRAW)
+            glBindBufferBase(GL_UNIFORM_BUFFER, self.BINDING, self.ubo)
+        if not self.dirty:
+            return
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.block.nbytes, self.block)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.dirty = False
+
+    def cleanup(self):
+        if self.ubo is not None:
+            glDeleteBuffers(1, [self.ubo])
+            self.ubo = None
 
 
 class SunLight:
-    def __init__(self, orbit_radius=5.0, speed=30.0, color=(1.0, 1.0, 0.9), intensity=1.0):
+    SLOT = 0  # LightBuffer slot
+
+    def __init__(self, orbit_radius=5.0, speed=30.0, color=(1.0, 1.0, 0.9), intensity=1.0,
+                 light_buffer=None):
         self.orbit_radius = orbit_radius
         self.speed = speed  # degrees per second
         self.angle = 0.0    # current angle in degrees
         self.color = list(color)
         self.intensity = intensity
         self.height = 4.0
+        self.light_buffer = light_buffer
+        self._write()
 
     def update(self, dt):
         self.angle += self.speed * dt
         self.angle %= 360.0
+        self._write()
+
+    def _write(self):
+        if self.light_buffer is None:
+            return
+        record = self.light_buffer.lights[self.SLOT]
+        record['type'] = 0  # directional
+        record['position'] = self.position
+        record['direction'] = self.direction
+        record['color'] = self.color
+        record['intensity'] = self.intensity
+        record['cutoff'] = 0.0
+        record['outer_cutoff'] = 0.0
+        record['radius'] = 0.0  # unused: reaches everything
+        self.light_buffer.mark_dirty()
 
     @property
     def position(self):
@@ -30,46 +144,42 @@ class SunLight:
     def change_speed(self, delta):
         self.speed = max(5.0, min(200.0, self.speed + delta))
 
-    def get_light_data(self):
-        return {
-            'type': 0,  # directional
-            'position': self.position,
-            'direction': self.direction,
-            'color': self.color,
-            'intensity': self.intensity,
-            'cutoff': 0.0,
-            'outerCutoff': 0.0,
-        }
-
 
 class SpotLight:
     def __init__(self, position, direction=(0, -1, 0), color=(1.0, 1.0, 1.0),
-                 intensity=2.0, cutoff=25.0, outer_cutoff=35.0):
+                 intensity=2.0, cutoff=25.0, outer_cutoff=35.0, radius=None, casts_shadows=True):
         self.position = list(position)
         self.direction = list(direction)
         self.color = list(color)
         self.intensity = intensity
         self.cutoff = math.cos(math.radians(cutoff))
         self.outer_cutoff = math.cos(math.radians(outer_cutoff))
+        self.radius = light_radius(intensity) if radius is None else radius
+        self.casts_shadows = casts_shadows
 
-    def get_light_data(self):
-        return {
-            'type': 1,  # point/spot
-            'position': self.position,
-            'direction': self.direction,
-            'color': self.color,
-            'intensity': self.intensity,
-            'cutoff': self.cutoff,
-            'outerCutoff': self.outer_cutoff,
-        }
+    def write_to(self, record):
+        record['type'] = 1  # point/spot
+        record['position'] = self.position
+        record['direction'] = self.direction
+        record['color'] = self.color
+        record['intensity'] = self.intensity
+        record['cutoff'] = self.cutoff
+        record['outer_cutoff'] = self.outer_cutoff
+        record['radius'] = self.radius
 
 
 class SpotLightManager:
     """Manages multiple spotlights."""
-    MAX_SPOTLIGHTS = 9  # reserve 1 slot for other lights
+    MAX_SPOTLIGHTS = MAX_LIGHTS - 1  # reserve 1 slot for other lights
+    FIRST_SLOT = 1      # LightBuffer slots 1..MAX_LIGHTS-1; slot 0 is the sun
 
-    def __init__(self):
+    def __init__(self, light_buffer=None):
         self.lights = []
+        self.light_buffer = light_buffer
+        # Shown while no spotlight has been added yet
+        self.default_light = SpotLight(position=(0, 5, 0), intensity=1.5)
+        self.default_light.cutoff = self.default_light.outer_cutoff = 0.0  # no cone
+        self._write()
 
     def add_spotlight(self, camera_pos, camera_target):
         if len(self.lights) >= self.MAX_SPOTLIGHTS:
@@ -85,12 +195,29 @@ class SpotLightManager:
             color=[1.0, 1.0, 1.0],
             intensity=2.5,
         )
-        self.lights.append(light)
+        self.add(light)
         print(f"Spotlight added ({len(self.lights)} total)")
 
+    def add(self, *lights):
+        """Add SpotLight objects, up to MAX_SPOTLIGHTS; returns how many fit."""
+        lights = lights[:self.MAX_SPOTLIGHTS - len(self.lights)]
+        self.lights.extend(lights)
+        self._write()
+        return len(lights)
+
     def clear(self):
         self.lights.clear()
+        self._write()
         print("All spotlights cleared")
 
-    def get_all_light_data(self):
-        return [l.get_light_data() for l in self.lights]
+    @property
+    def active_count(self):
+        """Number of LightBuffer slots in use (the default light counts when empty)."""
+        return max(1, len(self.lights))
+
+    def _write(self):
+        if self.light_buffer is None:
+            return
+        for i, light in enumerate(self.lights or [self.default_light]):
+            light.write_to(self.light_buffer.lights[self.FIRST_SLOT + i])
+        self.light_buffer.mark_dirty()
@@ -0,0 +1,139 @@
+import math
+import numpy as np
+
+
+def simplify(positions, indices, target_triangles, max_iterations=4):
+    """Simplify a triangle mesh to roughly target_triangles.
+
+    Uses quadric error metric vertex clustering (Lindstrom 2000): vertices are
+    binned into a uniform grid, each cell accumulates the plane quadrics of
+    the faces touching it and is replaced by the point that minimises them.
+    Unlike sequential edge collapses this runs in a few NumPy passes, so it
+    scales to multi-million triangle scans.
+
+    Returns (positions float32 (M, 3), indices uint32 flat triangle list).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    lo = positions.min(axis=0)
+    extent = max(float((positions.max(axis=0) - lo).max()), 1e-12)
+
+    # About two triangles per occupied cell; refine the grid size from the
+    # measured occupancy instead of guessing the surface area
+    grid = max(2, int(math.sqrt(target_triangles / (2 * math.pi))))
+    for _ in range(max_iterations):
+        cells = _cell_keys(positions, lo, extent, grid)
+        occupied = len(np.unique(cells))
+        scale = math.sqrt(target_triangles / max(2 * occupied, 1))
+        if 0.85 < scale < 1.15:
+            break
+        grid = max(2, int(round(grid * scale)))
+    else:
+        cells = _cell_keys(positions, lo, extent, grid)
+
+    keys, cluster = np.unique(cells, return_inverse=True)
+    cluster = cluster.ravel()
+    reps = _cluster_positions(positions, indices, cluster, len(keys), keys, lo, extent / grid, grid)
+
+    tris = cluster[indices]
+    keep = (tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 0] != tris[:, 2])
+    tris = tris[keep]
+    tris = tris[_first_unique_triangles(tris)]
+
+    used, remap = np.unique(tris, return_inverse=True)
+    return reps[used].astype(np.float32), remap.reshape(-1).astype(np.uint32)
+
+
+def _cell_keys(positions, lo, extent, grid):
+    cell = np.minimum(((positions - lo) * (grid / extent)).astype(np.int64), grid - 1)
+    return (cell[:, 0] * grid + cell[:, 1]) * grid + cell[:, 2]
+
+
+def _cluster_positions(positions, tris, cluster, num_clusters, keys, lo, cell_size, grid, max_triangles=1 << 17):
+    """Point minimising each cluster's summed face quadric, kept inside its cell.
+
+    Face quadrics are accumulated max_triangles faces at a time, which bounds
+    their per-face temporaries on multi-million triangle meshes.
+    """
+    rows, cols = np.triu_indices(4)
+    quadric = np.zeros((num_clusters, 10))
+    for start in range(0, len(tris), max_triangles):
+        block = tris[start:start + max_triangles]
+        coeffs = _face_quadrics(positions, block, rows, cols)
+        for corner in range(3):
+            corner_cluster = cluster[block[:, corner]]
+            for k in range(10):
+                quadric[:, k] += np.bincount(corner_cluster, coeffs[:, k], minlength=num_clusters)
+
+    full = np.zeros((num_clusters, 4, 4))
+    full[:, rows, cols] = quadric
+    full[:, cols, rows] = quadric
+    a = full[:, :3, :3]
+    b = full[:, :3, 3]
+
+    counts = np.bincount(cluster, minlength=num_clusters)[:, None]
+    mean = np.stack([np.bincount(cluster, positions[:, k], minlength=num_clusters) for k in range(3)], axis=1)
+    mean /= np.maximum(counts, 1)
+
+    # Tikhonov pull towards the mean keeps flat or linear cells solvable
+    lam = 1e-3 * np.trace(a, axis1=1, axis2=2) / 3.0 + 1e-12
+    a = a + lam[:, None, None] * np.eye(3)
+    rhs = lam[:, None] * mean - b
+    reps = np.linalg.solve(a, rhs[:, :, None])[:, :, 0]
+
+    cell = np.stack([keys // (grid * grid), (keys // grid) % grid, keys % grid], axis=1)
+    cell_lo = lo + cell * cell_size
+    return np.clip(reps, cell_lo, cell_lo + cell_size)
+
+
+def _face_quadrics(positions, tris, rows, cols):
+    """The 10 unique coefficients (rows, cols) of each face's area-weighted plane quadric."""
+    p0, p1, p2 = positions[tris[:, 0]], positions[tris[:, 1]], positions[tris[:, 2]]
+    cross = np.cross(p1 - p0, p2 - p0)
+    area2 = np.linalg.norm(cross, axis=1)
+    valid = area2 > 0
+    n = np.zeros_like(cross)
+    n[valid] = cross[valid] / area2[valid, None]
+    d = -np.einsum('ij,ij->i', n, p0)
+    plane = np.column_stack([n, d])
+    weight = 0.5 * area2
+    return plane[:, rows] * plane[:, cols] * weight[:, None]
+
+
+def _first_unique_triangles(tris):
+    """Indices of the first triangle of every distinct vertex set."""
+    key = np.sort(tris, axis=1)
+    order = np.lexsort((key[:, 2], key[:, 1], key[:, 0]))
+    key = key[order]
+    new = np.ones(len(key), dtype=bool)
+    new[1:] = (key[1:] != key[:-1]).any(axis=1)
+    return np.sort(order[new])
+
+
+def select_level(triangle_counts, current, desired, hysteresis):
+    """Coarsest level with at least `desired` triangles, sticky around the current one.
+
+    Refining happens as soon as the current level has too few triangles;
+    coarsening only once the coarser level beats the need by `hysteresis`,
+    so a camera hovering at a threshold doesn't flip between levels.
+    """
+    level = min(current, len(triangle_counts) - 1)
+    while level > 0 and triangle_counts[level] < desired:
+        level -= 1
+    while level + 1 < len(triangle_counts) and triangle_counts[level + 1] * (1.0 - hysteresis) >= desired:
+        level += 1
+    return level
+
+
+def select_levels(triangle_counts, current, desired, hysteresis):
+    """select_level for arrays of current levels and budgets (one per instance)."""
+    counts = np.asarray(triangle_counts)
+    last = len(counts) - 1
+    level = np.minimum(current, last)
+    for _ in range(last):
+        refine = (level > 0) & (counts[level] < desired)
+        level = level - refine
+    for _ in range(last):
+        coarsen = (level < last) & (counts[np.minimum(level + 1, last)] * (1.0 - hysteresis) >= desired)
+        level = level + coarsen
+    return level
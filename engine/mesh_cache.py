@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+
+class MeshCache:
+    """On-disk cache of the final vertex/index buffers produced by Mesh.prepare.
+
+    Each entry is one file: a JSON header padded to a multiple of
+    HEADER_ALIGN bytes (its size is written right after MAGIC) followed by
+    the raw vertex and index buffers, so a hit is just a header read plus two
+    np.memmap views that can be handed straight to glBufferData.
+
+    Entries are keyed by source path and load options, and validated against
+    the source's size and mtime. When only the mtime changed (e.g. the file
+    was copied or touched), the content hash decides and the entry is kept.
+    """
+    MAGIC = b"CGMESH04"
+    HEADER_ALIGN = 4096
+    SIZE_DIGITS = 10
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, source_path, variant):
+        key = f"{os.path.abspath(source_path)}|{variant}".encode()
+        return os.path.join(self.cache_dir, hashlib.blake2b(key, digest_size=16).hexdigest() + ".mesh")
+
+    def load(self, source_path, variant):
+        """Return (vertex_data, index_data, info) or None on a miss."""
+        path = self.entry_path(source_path, variant)
+        header, header_size = self._read_header(path)
+        if header is None or header['variant'] != variant:
+            return None
+        st = os.stat(source_path)
+        if st.st_size != header['size']:
+            return None
+        if st.st_mtime_ns != header['mtime_ns']:
+            if self.content_hash(source_path) != header['hash']:
+                return None
+            header['mtime_ns'] = st.st_mtime_ns
+            self._write_header(path, header, header_size)
+
+        offset = header_size
+        try:
+            vertex_data = np.memmap(path, dtype=np.dtype(header['vertex_dtype']), mode='r', offset=offset,
+                                    shape=tuple(header['vertex_shape']))
+            offset += vertex_data.nbytes
+            index_data = np.memmap(path, dtype=np.dtype(header['index_dtype']), mode='r', offset=offset,
+                                   shape=(header['index_count'],))
+        except (OSError, ValueError):
+            return None
+        return vertex_data, index_data, header['info']
+
+    def store(self, source_path, variant, vertex_data, index_data, info):
+        st = os.stat(source_path)
+        header = {
+            'source': os.path.abspath(source_path),
+            'variant': variant,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': self.content_hash(source_path),
+            'vertex_dtype': vertex_data.dtype.str,
+            'vertex_shape': list(vertex_data.shape),
+            'index_dtype': index_data.dtype.str,
+            'index_count': len(index_data),
+            'info': info,
+        }
+        path = self.entry_path(source_path, variant)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._encode_header(header))
+            f.write(np.ascontiguousarray(vertex_data).tobytes())
+            f.write(np.ascontiguousarray(index_data).tobytes())
+        os.replace(tmp_path, path)
+
+    def content_hash(self, source_path):
+        h = hashlib.blake2b(digest_size=16)
+        with open(source_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _encode_header(self, header, size=None):
+        body = json.dumps(header).encode()
+        prefix = len(self.MAGIC) + self.SIZE_DIGITS
+        if size is None:
+            # Some slack so rewriting the mtime in place always fits
+            size = -(-(prefix + len(body) + 64) // self.HEADER_ALIGN) * self.HEADER_ALIGN
+        if prefix + len(body) > size:
+            raise ValueError("Mesh cache header too large")
+        return (self.MAGIC + str(size).zfill(self.SIZE_DIGITS).encode() + body).ljust(size, b' ')
+
+    def _read_header(self, path):
+        """Return (header, header_size), or (None, 0) if unreadable."""
+        prefix = len(self.MAGIC) + self.SIZE_DIGITS
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(prefix)
+                if len(data) < prefix or not data.startswith(self.MAGIC):
+                    return None, 0
+                size = int(data[len(self.MAGIC):])
+                body = f.read(size - prefix)
+        except (OSError, ValueError):
+            return None, 0
+        if len(body) < size - prefix:
+            return None, 0
+        try:
+            return json.loads(body.decode()), size
+        except ValueError:
+            return None, 0
+
+    def _write_header(self, path, header, size):
+        with open(path, 'r+b') as f:
+            f.write(self._encode_header(header, size))
@@ -0,0 +1,102 @@
+"""Windowless OpenGL rendering through EGL (works with Mesa llvmpipe).
+
+PyOpenGL picks its platform on first import, so PYOPENGL_PLATFORM=egl must
+be set before this or any other engine module is imported (see
+render_headless.py).
+"""
+import ctypes
+import numpy as np
+from OpenGL import EGL
+from OpenGL.GL import *
+
+
+def create_egl_context(major=3, minor=3):
+    """Create a core-profile GL context with a 1x1 pbuffer and make it current.
+
+    Rendering is meant to go to an OffscreenTarget, not to the pbuffer.
+    """
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("eglInitialize failed")
+    config_attribs = (EGL.EGLint * 5)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE,
+    )
+    config = EGL.EGLConfig()
+    num_configs = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, config_attribs, ctypes.pointer(config), 1,
+                               ctypes.pointer(num_configs)) or num_configs.value == 0:
+        raise RuntimeError("No EGL config supports desktop OpenGL pbuffers")
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context_attribs = (EGL.EGLint * 7)(
+        EGL.EGL_CONTEXT_MAJOR_VERSION, major,
+        EGL.EGL_CONTEXT_MINOR_VERSION, minor,
+        EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+        EGL.EGL_NONE,
+    )
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+    if not context:
+        raise RuntimeError(f"Could not create an OpenGL {major}.{minor} core context")
+    surface = EGL.eglCreatePbufferSurface(display, config, (EGL.EGLint * 5)(
+        EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE))
+    EGL.eglMakeCurrent(display, surface, surface, context)
+    return display
+
+
+class OffscreenTarget:
+    """Framebuffer object to render into, with optional MSAA resolve."""
+
+    def __init__(self, width, height, samples=4):
+        self.width = width
+        self.height = height
+        self.samples = samples
+        self.renderbuffers = []
+        self.framebuffers = []
+
+        def make_fbo(samples, with_depth):
+            fbo = glGenFramebuffers(1)
+            glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+            attachments = [(GL_RGBA8, GL_COLOR_ATTACHMENT0)]
+            if with_depth:
+                attachments.append((GL_DEPTH_COMPONENT24, GL_DEPTH_ATTACHMENT))
+            for fmt, attachment in attachments:
+                rbo = glGenRenderbuffers(1)
+                glBindRenderbuffer(GL_RENDERBUFFER, rbo)
+                if samples > 1:
+                    glRenderbufferStorageMultisample(GL_RENDERBUFFER, samples, fmt, width, height)
+                else:
+                    glRenderbufferStorage(GL_RENDERBUFFER, fmt, width, height)
+                glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, rbo)
+                self.renderbuffers.append(rbo)
+            if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+                raise RuntimeError("Offscreen framebuffer is incomplete")
+            self.framebuffers.append(fbo)
+            return fbo
+
+        self.fbo = make_fbo(samples, with_depth=True)
+        # Multisampled renderbuffers can't be read directly; resolve into this one
+        self.resolve_fbo = make_fbo(1, with_depth=False) if samples > 1 else self.fbo
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def read_rgb(self):
+        """Resolve and read the frame as an (height, width, 3) uint8 array, top row first."""
+        if self.resolve_fbo != self.fbo:
+            glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.resolve_fbo)
+            glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height,
+                              GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.resolve_fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        return pixels[::-1]
+
+    def cleanup(self):
+        glDeleteFramebuffers(len(self.framebuffers), self.framebuffers)
+        glDeleteRenderbuffers(len(self.renderbuffers), self.renderbuffers)
+        self.framebuffers, self.renderbuffers = [], []
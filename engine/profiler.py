@@ -0,0 +1,215 @@
+import ctypes
+import json
+import time
+from collections import deque
+import numpy as np
+from OpenGL.GL import *
+# Raw entry points: the PyOpenGL wrapper of glGetQueryObjectui64v has no
+# array type for 64-bit results, and the raw calls avoid per-call overhead
+from OpenGL.raw.GL.VERSION.GL_1_5 import glGetQueryObjectiv as _get_query_iv
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as _get_query_ui64v
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullProfiler:
+    """Profiler stand-in that records nothing; the default for Scene."""
+    enabled = False
+
+    def stage(self, name, gpu=False):
+        return _NULL_STAGE
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "query", "start")
+
+    def __init__(self, profiler, name, gpu):
+        self.profiler = profiler
+        self.name = name
+        self.query = profiler._acquire_query() if gpu else None
+
+    def __enter__(self):
+        if self.query is not None:
+            glBeginQuery(GL_TIME_ELAPSED, self.query)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        if self.query is not None:
+            glEndQuery(GL_TIME_ELAPSED)
+        self.profiler._record(self.name, self.start, end, self.query)
+        return False
+
+
+class FrameProfiler:
+    """Per-stage CPU and GPU timings of the main loop.
+
+    Wrap each stage in `with profiler.stage(name, gpu=...)`. CPU time comes
+    from perf_counter; stages with gpu=True are also bracketed by a
+    GL_TIME_ELAPSED query. Queries are only read once the driver reports
+    them available (usually a frame or two later), so the CPU never waits on
+    the GPU. GPU stages must not be nested: only one elapsed-time query can
+    be active at a time.
+
+    Rolling p50/p95/p99 are kept for the last `history` frames; the last
+    `trace_frames` frames can be written as Chrome trace JSON
+    (chrome://tracing or ui.perfetto.dev). GPU events are placed at the CPU
+    time their commands were submitted; their length is the GPU time.
+    """
+    MAX_FRAMES_IN_FLIGHT = 6  # beyond this the oldest results are read even if it stalls
+
+    def __init__(self, history=300, trace_frames=600, gpu=True):
+        self.enabled = False
+        self.gpu = gpu
+        self.history = history
+        self.frame_ms = deque(maxlen=history)
+        self.gpu_frame_ms = deque(maxlen=history)
+        self.cpu_stage_ms = {}
+        self.gpu_stage_ms = {}
+        self.frame_index = 0
+        self._trace = deque(maxlen=trace_frames)  # one event list per frame
+        self._frame_start = None
+        self._frame_events = None
+        self._frame_queries = None
+        self._frame_samples = None  # (stage, CPU ms), kept once the frame ends
+        self._in_flight = deque()  # (events, [(name, query, start_ns)]) awaiting GPU results
+        self._free_queries = []
+        self._origin = time.perf_counter_ns()
+        self._available = ctypes.c_int()
+        self._elapsed = ctypes.c_uint64()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if not self.enabled:
+            self._frame_start = None
+        return self.enabled
+
+    def stage(self, name, gpu=False):
+        if self._frame_start is None:
+            return _NULL_STAGE
+        return _Stage(self, name, gpu and self.gpu)
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._collect_gpu_results()
+        self._frame_start = time.perf_counter_ns()
+        self._frame_events = []
+        self._frame_queries = []
+        self._frame_samples = []
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        end = time.perf_counter_ns()
+        for name, ms in self._frame_samples:
+            self.cpu_stage_ms.setdefault(name, deque(maxlen=self.history)).append(ms)
+        self.frame_ms.append((end - self._frame_start) / 1e6)
+        self._frame_events.append(self._event("frame", self._frame_start, end, tid=1))
+        self._trace.append(self._frame_events)
+        if self._frame_queries:
+            self._in_flight.append((self._frame_events, self._frame_queries))
+        self.frame_index += 1
+        self._frame_start = None
+
+    def discard_frame(self):
+        """Drop the frame in progress, e.g. when the loop decided not to draw it."""
+        if self._frame_start is None:
+            return
+        # Ended queries may be reused before their result is read
+        self._free_queries.extend(query for _, query, _ in self._frame_queries)
+        self._frame_start = None
+
+    def _record(self, name, start, end, query):
+        self._frame_samples.append((name, (end - start) / 1e6))
+        self._frame_events.append(self._event(name, start, end, tid=1))
+        if query is not None:
+            self._frame_queries.append((name, query, start))
+
+    def _event(self, name, start_ns, end_ns, tid):
+        return {"name": name, "ph": "X", "pid": 1, "tid": tid,
+                "ts": (start_ns - self._origin) / 1e3, "dur": (end_ns - start_ns) / 1e3}
+
+    def _acquire_query(self):
+        if self._free_queries:
+            return self._free_queries.pop()
+        return int(glGenQueries(1)[0])
+
+    def _collect_gpu_results(self):
+        """Read back every finished frame's queries without blocking."""
+        while self._in_flight:
+            events, queries = self._in_flight[0]
+            last_query = queries[-1][1]
+            _get_query_iv(last_query, GL_QUERY_RESULT_AVAILABLE, ctypes.byref(self._available))
+            if not self._available.value and len(self._in_flight) <= self.MAX_FRAMES_IN_FLIGHT:
+                return
+            self._in_flight.popleft()
+            gpu_total = 0.0
+            for name, query, start in queries:
+                _get_query_ui64v(query, GL_QUERY_RESULT, ctypes.byref(self._elapsed))
+                elapsed_ns = self._elapsed.value
+                gpu_total += elapsed_ns / 1e6
+                self.gpu_stage_ms.setdefault(name, deque(maxlen=self.history)).append(elapsed_ns / 1e6)
+                events.append(self._event(name, start, start + elapsed_ns, tid=2))
+                self._free_queries.append(query)
+            self.gpu_frame_ms.append(gpu_total)
+
+    @staticmethod
+    def percentiles(samples):
+        """(p50, p95, p99) of a sample window, or None when it is empty."""
+        if not samples:
+            return None
+        return tuple(np.percentile(np.fromiter(samples, dtype=np.float64), (50, 95, 99)))
+
+    def summary(self):
+        """One-line rolling frame statistics, for the window title."""
+        cpu = self.percentiles(self.frame_ms)
+        if cpu is None:
+            return "Profiler: collecting"
+        text = "CPU p50/95/99 {:.2f}/{:.2f}/{:.2f} ms".format(*cpu)
+        gpu = self.percentiles(self.gpu_frame_ms)
+        if gpu is not None:
+            text += " | GPU {:.2f}/{:.2f}/{:.2f} ms".format(*gpu)
+        return text
+
+    def report(self):
+        """Per-stage table of rolling CPU and GPU percentiles."""
+        lines = [f"{'stage':<20} {'CPU p50':>9} {'p95':>8} {'p99':>8}   {'GPU p50':>9} {'p95':>8} {'p99':>8}"]
+        for name, samples in self.cpu_stage_ms.items():
+            cpu = "{:9.3f} {:8.3f} {:8.3f}".format(*self.percentiles(samples))
+            gpu_samples = self.gpu_stage_ms.get(name)
+            gpu = "{:9.3f} {:8.3f} {:8.3f}".format(*self.percentiles(gpu_samples)) if gpu_samples else ""
+            lines.append(f"{name:<20} {cpu}   {gpu}")
+        lines.append(f"{'frame':<20} " + "{:9.3f} {:8.3f} {:8.3f}".format(*(self.percentiles(self.frame_ms) or (0, 0, 0))))
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """Write the recorded frames as Chrome trace event JSON."""
+        self._collect_gpu_results()
+        events = [
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "CG Project"}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "CPU"}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 2, "args": {"name": "GPU"}},
+        ]
+        for frame_events in self._trace:
+            events.extend(frame_events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(self._trace)
+
+    def cleanup(self):
+        queries = self._free_queries + [q for _, frame in self._in_flight for _, q, _ in frame]
+        if queries:
+            glDeleteQueries(len(queries), queries)
+        self._free_queries = []
+        self._in_flight.clear()
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+
+class GpuResidency:
+    """Tracks which meshes hold GL buffers and keeps them under a byte budget.
+
+    Meshes are kept in least-recently-viewed order; when the total exceeds
+    budget_bytes the oldest ones release their VAO/VBO/EBO. A budget of
+    None never evicts.
+    """
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes
+        self._lru = OrderedDict()  # name -> Mesh, most recently viewed last
+
+    @property
+    def total_bytes(self):
+        return sum(mesh.gpu_bytes for mesh in self._lru.values())
+
+    def touch(self, mesh):
+        if mesh.name in self._lru:
+            self._lru.move_to_end(mesh.name)
+
+    def add(self, mesh, pinned=()):
+        """Register a freshly uploaded mesh, evicting others if over budget."""
+        self._lru[mesh.name] = mesh
+        self._lru.move_to_end(mesh.name)
+        return self.evict_over_budget(pinned=set(pinned) | {mesh.name})
+
+    def evict_over_budget(self, pinned=()):
+        evicted = []
+        if self.budget_bytes is None:
+            return evicted
+        for name in list(self._lru):
+            if self.total_bytes <= self.budget_bytes:
+                break
+            if name in pinned:
+                continue
+            mesh = self._lru.pop(name)
+            mesh.cleanup()
+            evicted.append(name)
+        return evicted
+
+    def release_all(self):
+        for mesh in self._lru.values():
+            mesh.cleanup()
+        self._lru.clear()
+
+    def report(self):
+        """Per-mesh GPU bytes for the resident meshes, least recently viewed first."""
+        return {name: mesh.gpu_bytes for name, mesh in self._lru.items()}
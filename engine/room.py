@@ -1,90 +1,125 @@
-import math
 import numpy as np
 from OpenGL.GL import *
-import ctypes
+from engine.static_geometry import StaticGeometry
 
 
 class Room:
-    def __init__(self, size=6.0, height=4.0, pedestal_radius=0.6, pedestal_height=0.15, segments=40):
-        self.vao = None
-        self.vbo = None
-        self.vertex_count = 0
+    # Vértices em float32: decodificação identidade no vertex shader
+    position_offset = (0.0, 0.0, 0.0)
+    position_scale = (1.0, 1.0, 1.0)
+
+    def __init__(self, size=6.0, height=4.0, pedestal_radius=0.6, pedestal_height=0.15, segments=40,
+                 with_pedestal=True, geometry=None, name="room"):
+        # Sala e pedestal são partes indexadas de um StaticGeometry, que pode
+        # ser compartilhado com o Grid (um VBO/EBO para todo o cenário)
+        self.owns_geometry = geometry is None
+        self.geometry = geometry if geometry is not None else StaticGeometry()
+        self.shell_part = f"{name}.shell"
+        self.pedestal_part = f"{name}.pedestal"
+        self.with_pedestal = with_pedestal  # False: draw() desenha só a sala (pedestais instanciados à parte)
+        self.bounds = None  # AABB (1, 2, 3) para o frustum culling da Scene
+        self.pedestal = None
         self.pedestal_top_y = -1.0 + pedestal_height  # exposto para o scene usar
         self._setup(size, height, pedestal_radius, pedestal_height, segments)
 
-    def _quad(self, p0, p1, p2, p3, normal):
-        verts = []
-        for p in [p0, p1, p2, p0, p2, p3]:
-            verts.extend(p)
-            verts.extend(normal)
-        return verts
-
-    def _cylinder_top(self, cy, radius, segments):
-        """Disco superior do cilindro."""
-        verts = []
-        for i in range(segments):
-            a0 = 2 * math.pi * i / segments
-            a1 = 2 * math.pi * (i + 1) / segments
-            center = [0.0, cy, 0.0];  n = [0.0, 1.0, 0.0]
-            p0 = [math.cos(a0) * radius, cy, math.sin(a0) * radius]
-            p1 = [math.cos(a1) * radius, cy, math.sin(a1) * radius]
-            verts.extend(center + n); verts.extend(p0 + n); verts.extend(p1 + n)
-        return verts
-
-    def _cylinder_sides(self, cy_bot, cy_top, radius, segments):
-        """Lados do cilindro com normais suaves por vértice."""
-        verts = []
-        for i in range(segments):
-            a0 = 2 * math.pi * i / segments
-            a1 = 2 * math.pi * (i + 1) / segments
-            n0 = [math.cos(a0), 0.0, math.sin(a0)]
-            n1 = [math.cos(a1), 0.0, math.sin(a1)]
-            bl = [math.cos(a0)*radius, cy_bot, math.sin(a0)*radius]
-            br = [math.cos(a1)*radius, cy_bot, math.sin(a1)*radius]
-            tl = [math.cos(a0)*radius, cy_top, math.sin(a0)*radius]
-            tr = [math.cos(a1)*radius, cy_top, math.sin(a1)*radius]
-            verts.extend(bl+n0); verts.extend(tl+n0); verts.extend(br+n1)
-            verts.extend(br+n1); verts.extend(tl+n0); verts.extend(tr+n1)
-        return verts
-
     def _setup(self, s, h, pr, ph, segments):
+        (shell_v, shell_i), (pedestal_v, pedestal_i) = self._build_geometry(s, h, pr, ph, segments)
+        self.geometry.add(self.shell_part, shell_v, shell_i)
+        self.geometry.add(self.pedestal_part, pedestal_v, pedestal_i)
+        positions = np.vstack([shell_v[:, :3], pedestal_v[:, :3]])
+        self.bounds = np.stack([positions.min(axis=0), positions.max(axis=0)])[None]
+        self.pedestal = Pedestal(self.geometry, self.pedestal_part,
+                                 np.stack([pedestal_v[:, :3].min(axis=0), pedestal_v[:, :3].max(axis=0)])[None])
+
+    def _build_geometry(self, s, h, pr, ph, segments):
+        """Sala e pedestal como ((vértices (N, 6), índices), ...) em float32/uint32; não usa OpenGL.
+
+        Tudo em arrays NumPy (sem laços por segmento), então aumentar
+        `segments` não pesa na inicialização.
+        """
         floor_y = -1.0
-        top_y   = floor_y + ph
-        verts = []
-
-        # Paredes da sala (iguais ao anterior)
-        verts += self._quad([-s,floor_y,-s],[s,floor_y,-s],[s,floor_y,s],[-s,floor_y,s],[0,1,0])
-        verts += self._quad([-s,floor_y+h,-s],[-s,floor_y+h,s],[s,floor_y+h,s],[s,floor_y+h,-s],[0,-1,0])
-        verts += self._quad([-s,floor_y,-s],[-s,floor_y+h,-s],[s,floor_y+h,-s],[s,floor_y,-s],[0,0,1])
-        verts += self._quad([s,floor_y,s],[s,floor_y+h,s],[-s,floor_y+h,s],[-s,floor_y,s],[0,0,-1])
-        verts += self._quad([-s,floor_y,s],[-s,floor_y+h,s],[-s,floor_y+h,-s],[-s,floor_y,-s],[1,0,0])
-        verts += self._quad([s,floor_y,-s],[s,floor_y+h,-s],[s,floor_y+h,s],[s,floor_y,s],[-1,0,0])
-
-        # Pedestal redondo
-        verts += self._cylinder_top(top_y, pr, segments)
-        verts += self._cylinder_sides(floor_y, top_y, pr, segments)
-
-        data = np.array(verts, dtype=np.float32)
-        self.vertex_count = len(data) // 6
-
-        self.vao = glGenVertexArrays(1)
-        self.vbo = glGenBuffers(1)
-        glBindVertexArray(self.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
-        stride = 6 * 4
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(3*4))
-        glEnableVertexAttribArray(1)
-        glBindVertexArray(0)
+        top_y = floor_y + ph
+        return self._box_shell(s, floor_y, h), self._cylinder(floor_y, top_y, pr, segments)
+
+    def _box_shell(self, s, floor_y, h):
+        """Chão, teto e paredes: 6 quads de 4 vértices com normais para dentro."""
+        y0, y1 = floor_y, floor_y + h
+        corners = np.array([
+            [[-s, y0, -s], [s, y0, -s], [s, y0, s], [-s, y0, s]],      # chão
+            [[-s, y1, -s], [-s, y1, s], [s, y1, s], [s, y1, -s]],      # teto
+            [[-s, y0, -s], [-s, y1, -s], [s, y1, -s], [s, y0, -s]],    # parede -z
+            [[s, y0, s], [s, y1, s], [-s, y1, s], [-s, y0, s]],        # parede +z
+            [[-s, y0, s], [-s, y1, s], [-s, y1, -s], [-s, y0, -s]],    # parede -x
+            [[s, y0, -s], [s, y1, -s], [s, y1, s], [s, y0, s]],        # parede +x
+        ], dtype=np.float32)
+        normals = np.array([[0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1], [1, 0, 0], [-1, 0, 0]],
+                           dtype=np.float32)
+        vertices = np.concatenate([corners, np.broadcast_to(normals[:, None], (6, 4, 3))], axis=2)
+        indices = 4 * np.arange(6, dtype=np.uint32)[:, None] + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+        return vertices.reshape(-1, 6), indices.ravel()
+
+    def _cylinder(self, y_bottom, y_top, radius, segments):
+        """Pedestal redondo: disco superior em leque e lados com normais suaves por vértice."""
+        angles = 2.0 * np.pi * np.arange(segments) / segments
+        ring = np.stack([np.cos(angles), np.zeros(segments), np.sin(angles)], axis=1)
+        i = np.arange(segments, dtype=np.uint32)
+        nxt = (i + 1) % segments
+
+        # Disco: vértice central (0) + anel (1..segments), normal para cima
+        disc_pos = np.vstack([[0.0, y_top, 0.0], ring * radius + [0.0, y_top, 0.0]])
+        disc = np.hstack([disc_pos, np.tile([0.0, 1.0, 0.0], (segments + 1, 1))])
+        disc_idx = np.stack([np.zeros(segments, dtype=np.uint32), 1 + i, 1 + nxt], axis=1)
+
+        # Lados: anel de baixo (b) e de cima (t) com normal radial
+        bottom = np.hstack([ring * radius + [0.0, y_bottom, 0.0], ring])
+        top = np.hstack([ring * radius + [0.0, y_top, 0.0], ring])
+        b = segments + 1 + i
+        t = b + segments
+        b_next = segments + 1 + nxt
+        t_next = b_next + segments
+        side_idx = np.stack([b, t, b_next, b_next, t, t_next], axis=1)
+
+        vertices = np.vstack([disc, bottom, top]).astype(np.float32)
+        indices = np.concatenate([disc_idx.ravel(), side_idx.ravel()]).astype(np.uint32)
+        return vertices, indices
 
     def draw(self):
-        glBindVertexArray(self.vao)
-        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
-        glBindVertexArray(0)
+        parts = [self.shell_part, self.pedestal_part] if self.with_pedestal else [self.shell_part]
+        self.geometry.draw(parts)
+
+    def draw_shadow(self):
+        # Só o pedestal projeta sombra: as paredes e o teto cercam a cena e
+        # bloqueariam o sol, que orbita do lado de fora
+        if self.with_pedestal:
+            self.geometry.draw([self.pedestal_part])
 
     def cleanup(self):
-        if self.vao:
-            glDeleteVertexArrays(1, [self.vao])
-            glDeleteBuffers(1, [self.vbo])
\ No newline at end of file
+        if self.owns_geometry:
+            self.geometry.cleanup()
+
+
+class Pedestal:
+    """Parte do pedestal no StaticGeometry de uma Room, desenhada instanciada (engine.instancing)."""
+    position_offset = (0.0, 0.0, 0.0)
+    position_scale = (1.0, 1.0, 1.0)
+    bounds_radius = 0.0  # sem LOD
+    lods = []
+
+    def __init__(self, geometry, part, bounds):
+        self.geometry = geometry
+        self.part = part
+        self.bounds = bounds
+
+    @property
+    def is_ready(self):
+        return self.geometry.is_ready
+
+    @property
+    def vbo(self):
+        return self.geometry.vbo
+
+    def bind_vertex_attributes(self):
+        self.geometry.bind_vertex_attributes()
+
+    def draw_instanced(self, instance_count, level=0):
+        self.geometry.draw_instanced(self.part, instance_count)
@@ -1,45 +1,322 @@
+import math
 import os
-from engine.transform import identity, normal_matrix, perspective, translate
-from engine.mesh import Mesh
+import time
+import multiprocessing
+from concurrent.futures import Future
+import numpy as np
+from engine.transform import perspective
+from engine.culling import BVH, frustum_planes, transform_aabbs
+from engine.mesh import Mesh, parse_obj_file
+from engine.mesh_cache import MeshCache
+from engine.residency import GpuResidency
 from engine.camera import Camera
-from engine.light import SunLight, SpotLightManager
-from engine.transform import identity, normal_matrix, perspective
+from engine.clustering import LightClusters
+from engine.light import LightBuffer, SunLight, SpotLightManager
+from engine.profiler import NullProfiler
+from engine.scene_graph import SceneGraph
+from engine.shadows import ShadowMaps
 
 
 class Scene:
     LIGHT_MODE_SUN = 0
     LIGHT_MODE_SPOTLIGHTS = 1
 
-    def __init__(self, models_dir):
+    def __init__(self, models_dir, cache_dir=None, load_workers=None,
+                 lazy_loading=False, gpu_budget_bytes=None, background_loading=True,
+                 vertex_format='float32', chunk_triangles=None):
         self.camera = Camera(target=(0, 0, 0), distance=3.0)
         self.meshes = []
         self.mesh_names = []
-        self.active_mesh_index = 0
+        self.mesh_paths = []
+        self.active_mesh_index = 0   # mesh being drawn
+        self.target_mesh_index = 0   # mesh requested with Tab; becomes active once uploaded
         self.light_mode = self.LIGHT_MODE_SUN
-        self.sun = SunLight()
-        self.spotlights = SpotLightManager()
-        self.model_matrix = identity()
-        self.object_color = [0.7, 0.7, 0.75]
+        self.light_buffer = LightBuffer()
+        self.sun = SunLight(light_buffer=self.light_buffer)
+        self.spotlights = SpotLightManager(light_buffer=self.light_buffer)
         self.ambient_strength = 0.15
+        # Clustered lighting: fragments only loop over the lights of their
+        # cluster of the view frustum (False: over every active light)
+        self.clustered_lighting = True
+        self.light_clusters = LightClusters(self.light_buffer)
         self.models_dir = models_dir
+        self._projection_size = None
+        self._projection = np.eye(4, dtype=np.float32)
+        self._clip = np.empty((4, 4), dtype=np.float32)  # projection @ view
+        # Everything drawn with the model shader is a graph node; the statue
+        # node shows the active mesh on top of the pedestal
+        self.graph = SceneGraph()
+        self.statue = self.graph.add(name="statue", color=(0.7, 0.7, 0.75))
+        self.cache_dir = cache_dir
+        self.mesh_cache = MeshCache(cache_dir) if cache_dir else None
+        self.load_workers = load_workers or os.cpu_count() or 1
+        self.lazy_loading = lazy_loading
+        self.background_loading = background_loading  # False: parse on this thread when needed
+        self.residency = GpuResidency(gpu_budget_bytes)
+        self._pending = {}   # mesh index -> parsed buffers or a pool future
+        self._load_queue = []  # mesh indices waiting to be uploaded, in order
+        self._pool = None
+        # Per-frame GPU upload limits so a big model never stalls a frame
+        self.upload_time_budget = 0.004  # seconds
+        self.upload_chunk_bytes = 4 * 2**20
         self.pedestal_top_y = -0.85 
+        # Normal generation for models without vn records
+        self.normal_weighting = 'area'
+        self.crease_angle = None  # e.g. 45.0 keeps hard edges on pedestal-like models
+        self.vertex_format = vertex_format  # 'compact' halves vertex memory (Mesh.pack_compact)
+        self.optimize_cache = True  # Tipsify + fetch reordering at load time (Mesh.optimize_vertex_order)
+        self.chunk_triangles = chunk_triangles  # split big meshes into chunks culled one by one
+        self.profiler = NullProfiler()  # main.py swaps in a FrameProfiler
+        # Level of detail: simplified levels built at load time, picked per frame
+        # from the model's projected size
+        self.fov = 45.0
+        self.near_plane = 0.1
+        self.far_plane = 100.0
+        self.lod_levels = 3
+        self.lod_pixels_per_triangle = 2.0  # covered pixels per triangle wanted
+        self.lod_hysteresis = 0.25
+        # Frustum culling of drawables (and mesh chunks) through a BVH over
+        # their world AABBs, rebuilt when the set of parts changes and refit
+        # when only the scene graph moved
+        self.frustum_culling = True
+        self.cull_stats = {'objects': 0, 'visible_objects': 0, 'parts': 0, 'visible_parts': 0,
+                           'instances': 0, 'visible_instances': 0}
+        self._bvh = None
+        self._cull_parts = None    # (node index, bounds array) per drawable, identifies the BVH items
+        self._cull_version = None  # graph version the BVH was fitted to
+        self._cull_view = None     # (camera version, viewport) of the last cull
+        self._visible = None
+        self._part_ranges = []     # slice of the BVH items per drawable
+        # Gallery mode (engine.gallery): every model on instanced pedestals
+        # instead of the single statue node
+        self.gallery = None
+        self._gallery_key = None
+        # Shadow maps (engine.shadows.ShadowMaps, set up by main.py); None = no shadows.
+        # Casters are drawn at fixed LOD levels so camera moves don't re-render them
+        self.shadows = None
+        self.shadow_lod_level = 0
+        self.instance_shadow_lod_level = 1  # gallery statues: hundreds of them
+        self._shadow_key = None
+        self._shadow_bounds = None
 
-    def load_models(self):
-        obj_files = sorted([f for f in os.listdir(self.models_dir) if f.endswith('.obj')])
-        for fname in obj_files:
-            mesh = Mesh(name=fname.replace('.obj', ''))
-            mesh.load_obj(os.path.join(self.models_dir, fname))
-            self.meshes.append(mesh)
-            self.mesh_names.append(mesh.name)
-        if not self.meshes:
+    def load_models(self, names=None):
+        """Register every .obj in models_dir (or just the given file names) and
+        queue the ones needed now.
+
+        Nothing is uploaded here: parsing and normal generation run in a
+        process pool and update_loading (called every frame from update)
+        streams finished buffers to the GPU in bounded chunks. Meshes keep the
+        sorted file order regardless of which worker finishes first. With
+        lazy_loading only the active model is queued and the next one in Tab
+        order is parsed ahead; the others load on first switch_model.
+        """
+        if names is None:
+            names = [f for f in os.listdir(self.models_dir) if f.endswith('.obj')]
+        obj_files = sorted(names)
+        if not obj_files:
             raise RuntimeError(f"No .obj files found in {self.models_dir}")
-        print(f"Models loaded: {', '.join(self.mesh_names)}")
+        for fname in obj_files:
+            self.meshes.append(Mesh(name=fname.replace('.obj', ''),
+                                    normal_weighting=self.normal_weighting,
+                                    crease_angle=self.crease_angle,
+                                    lod_levels=self.lod_levels,
+                                    vertex_format=self.vertex_format,
+                                    optimize_cache=self.optimize_cache,
+                                    chunk_triangles=self.chunk_triangles))
+            self.mesh_names.append(self.meshes[-1].name)
+            self.mesh_paths.append(os.path.join(self.models_dir, fname))
+
+        if self.lazy_loading:
+            self._load_queue = [self.active_mesh_index]
+            self._prefetch(self.active_mesh_index)
+            self._prefetch(self._next_index(self.active_mesh_index))
+        else:
+            self._load_queue = list(range(len(self.meshes)))
+            # Largest files first so one big scan doesn't end up last in the pool
+            for i in sorted(self._load_queue, key=lambda i: os.path.getsize(self.mesh_paths[i]), reverse=True):
+                self._prefetch(i)
+        self.statue.drawable = self.meshes[self.active_mesh_index]
+        print(f"Models registered: {', '.join(self.mesh_names)}")
+
+    def finish_loading(self):
+        """Block until every queued mesh is uploaded."""
+        self.update_loading(time_budget=float('inf'), block=True)
+
+    def update_loading(self, time_budget=None, block=False):
+        """Advance the loading pipeline without exceeding time_budget seconds.
+
+        Takes the head of the queue through parse (waiting for the pool only
+        when block is set) and chunked upload; returns early once the budget
+        is used up and picks up where it left off on the next call.
+        """
+        budget = self.upload_time_budget if time_budget is None else time_budget
+        start = time.perf_counter()
+        while self._load_queue:
+            index = self._load_queue[0]
+            mesh = self.meshes[index]
+            if not mesh.is_resident:
+                self._prefetch(index)
+                source, result = self._pending[index]
+                if isinstance(result, Future) and not (block or result.done()):
+                    return
+                try:
+                    if isinstance(result, Future):
+                        result = result.result()
+                    elif result is None:
+                        result = parse_obj_file(self.mesh_paths[index], self.normal_weighting, self.crease_angle,
+                                                self.cache_dir, self.lod_levels, self.vertex_format,
+                                                self.optimize_cache, self.chunk_triangles)
+                except Exception as e:
+                    self._load_failed(index, e)
+                    continue
+                del self._pending[index]
+                vertex_data, index_data, info = result
+                mesh.apply_info(info)
+                mesh.begin_upload(vertex_data, index_data)
+                mesh.load_source = source
+                evicted = self.residency.add(mesh, pinned=self._pinned_names())
+                if evicted:
+                    print(f"Evicted from GPU: {', '.join(evicted)} "
+                          f"({self.residency.total_bytes / 2**20:.1f} MB resident)")
+            while not mesh.continue_upload(self.upload_chunk_bytes):
+                if time.perf_counter() - start >= budget:
+                    return
+            self._load_queue.pop(0)
+            print(f"Loaded '{mesh.name}' ({mesh.load_source}): {mesh.gpu_bytes / 2**20:.1f} MB "
+                  f"({mesh.float_bytes / 2**20:.1f} MB as float32), "
+                  f"LOD triangles {'/'.join(str(r[1] // 3) for r in mesh.lods)}"
+                  + (f", ACMR {mesh.acmr[0]:.2f} -> {mesh.acmr[1]:.2f}" if mesh.acmr else ""))
+            if index == self.target_mesh_index:
+                self._activate(index)
+            if not self._load_queue and not self.lazy_loading and self.residency.budget_bytes is None:
+                self._shutdown_pool()  # everything is resident and nothing will be evicted
+            if time.perf_counter() - start >= budget:
+                return
+
+    def _load_failed(self, index, error):
+        """Drop a mesh whose parse raised; whatever is on screen stays there."""
+        mesh = self.meshes[index]
+        mesh.load_error = error
+        self._pending.pop(index, None)
+        self._load_queue = [i for i in self._load_queue if i != index]
+        if self.target_mesh_index == index:
+            self.target_mesh_index = self.active_mesh_index
+        print(f"Failed to load model '{mesh.name}', keeping the current one: {error}")
+
+    def loading_status(self):
+        """Short description of the load in progress, or None when idle."""
+        if not self._load_queue:
+            return None
+        mesh = self.meshes[self._load_queue[0]]
+        if mesh.is_resident:
+            return f"Loading {mesh.name}: {mesh.upload_progress * 100:.0f}%"
+        return f"Loading {mesh.name}: parsing"
+
+    def _next_index(self, index):
+        return (index + 1) % len(self.meshes)
+
+    def _pinned_names(self):
+        if self.gallery is not None:
+            return set(self.mesh_names)  # all on screen at once; evicting would only thrash
+        return {self.mesh_names[self.active_mesh_index], self.mesh_names[self.target_mesh_index]}
+
+    def _activate(self, index):
+        changed = index != self.active_mesh_index
+        self.active_mesh_index = index
+        if self.gallery is None:
+            self.statue.drawable = self.meshes[index]
+        self.residency.touch(self.meshes[index])
+        if changed:
+            print(f"Switched to model: {self.mesh_names[index]}")
+
+    def _prefetch(self, index):
+        """Start getting a mesh's buffers ready without uploading them."""
+        mesh = self.meshes[index]
+        if mesh.is_resident or index in self._pending or mesh.load_error is not None:
+            return
+        path = self.mesh_paths[index]
+        cached = self.mesh_cache.load(path, mesh.cache_variant()) if self.mesh_cache else None
+        if cached is not None:
+            self._pending[index] = ("cache", cached)
+        elif not self.background_loading:
+            self._pending[index] = ("obj", None)
+        else:
+            future = self._executor().submit(parse_obj_file, path, self.normal_weighting, self.crease_angle,
+                                             self.cache_dir, self.lod_levels, self.vertex_format,
+                                             self.optimize_cache, self.chunk_triangles)
+            self._pending[index] = ("obj", future)
+
+    def _executor(self):
+        if self._pool is None:
+            # Imported on first use: it costs ~30 ms of startup, and models found
+            # in the mesh cache never need the pool
+            from concurrent.futures import ProcessPoolExecutor
+            # Spawned workers don't inherit the window's GL/SDL state
+            ctx = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.load_workers, mp_context=ctx)
+        return self._pool
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def gpu_memory_report(self):
+        """GPU bytes per resident mesh plus the total and configured budget.
+
+        float32_bytes is what the resident meshes would take with float32
+        vertices and uint32 indices, to show the compact format's savings.
+        """
+        return {
+            'meshes': self.residency.report(),
+            'total_bytes': self.residency.total_bytes,
+            'float32_bytes': sum(m.float_bytes for m in self.meshes if m.is_resident),
+            'budget_bytes': self.residency.budget_bytes,
+            'vertex_format': self.vertex_format,
+        }
+
+    def has_pending_work(self):
+        """Whether coming frames still change the picture on their own: a model
+        is loading or shadow maps are waiting for their per-frame budget."""
+        return bool(self._load_queue) or (self.shadows is not None and self.shadows.pending > 0)
 
     def switch_model(self):
-        if len(self.meshes) <= 1:
+        """Request the next model in Tab order.
+
+        The current model stays on screen until the requested one has been
+        uploaded. Models that failed to load are skipped.
+        """
+        if not any(m.load_error is None for i, m in enumerate(self.meshes) if i != self.target_mesh_index):
             return
-        self.active_mesh_index = (self.active_mesh_index + 1) % len(self.meshes)
-        print(f"Switched to model: {self.mesh_names[self.active_mesh_index]}")
+        index = self._next_index(self.target_mesh_index)
+        while self.meshes[index].load_error is not None:
+            index = self._next_index(index)  # models that failed to parse are skipped
+        self.target_mesh_index = index
+        if self.meshes[self.target_mesh_index].is_ready:
+            self._activate(self.target_mesh_index)
+        else:
+            # Requested model goes first; drop skipped ones that haven't started uploading
+            rest = [i for i in self._load_queue if i != self.target_mesh_index
+                    and (self.meshes[i].is_resident or not self.lazy_loading)]
+            self._load_queue = [self.target_mesh_index] + rest
+            print(f"Loading model: {self.mesh_names[self.target_mesh_index]}")
+        self._prefetch(self._next_index(self.target_mesh_index))
+
+    def set_gallery(self, gallery):
+        """Switch to gallery mode: the hall joins the scene graph, the statue
+        node is emptied and every model is queued for upload."""
+        self.gallery = gallery
+        self.graph.add(gallery.hall, name="hall", color=(0.92, 0.92, 0.90))
+        self.statue.drawable = None
+        self.pedestal_top_y = gallery.pedestal_top_y
+        for i in range(len(self.meshes)):
+            if i not in self._load_queue and not self.meshes[i].is_ready and self.meshes[i].load_error is None:
+                self._load_queue.append(i)
+                self._prefetch(i)
+        self.camera.max_distance = 0.95 * gallery.half_size
+        self.camera.distance = 0.8 * gallery.half_size
+        self.camera.max_pitch = gallery.MAX_CAMERA_PITCH
+        self.camera.pitch = 20.0
 
     def toggle_light_mode(self, mode):
         self.light_mode = mode
@@ -47,58 +324,252 @@ class Scene:
         print(f"Light mode: {mode_name}")
 
     def update(self, dt):
+        self.update_loading()
         if self.light_mode == self.LIGHT_MODE_SUN:
             self.sun.update(dt)
+        if self.meshes:
+            # Stand the active mesh on the pedestal; only a change marks the node dirty
+            lift = self.pedestal_top_y - self.meshes[self.active_mesh_index].bottom_y
+            if self.statue.translation[1] != np.float32(lift):
+                self.statue.translation = (0.0, lift, 0.0)
+        self.graph.update()
+
+    def get_projection(self, width, height):
+        """Perspective matrix, recomputed only when the viewport size changes."""
+        if (width, height) != self._projection_size:
+            perspective(self.fov, self._aspect(width, height), self.near_plane, self.far_plane, out=self._projection)
+            self._projection_size = (width, height)
+        return self._projection
+
+    def _clip_matrix(self, width, height):
+        """projection @ view, written into a preallocated matrix."""
+        return np.matmul(self.get_projection(width, height), self.camera.get_view_matrix(), out=self._clip)
+
+    def _aspect(self, width, height):
+        return width / height if height > 0 else 1.0
+
+    def render(self, shader, width, height):
+        """Draw every graph node that has a drawable and is in the view frustum.
 
-    def get_active_lights(self):
+        Per-node matrices come precomputed from SceneGraph.update (called in
+        update), so a static scene only sets uniforms, which the Shader skips
+        when unchanged, and issues draw calls.
+        """
+        nodes = self.graph.drawables()
+        if self.shadows is not None:
+            with self.profiler.stage("render.shadows", gpu=True):
+                self._update_shadows(nodes)
+        with self.profiler.stage("render.uniforms", gpu=True):
+            self._set_frame_uniforms(shader, width, height)
+        with self.profiler.stage("render.clusters", gpu=True):
+            self._update_clusters(shader, width, height)
+        with self.profiler.stage("render.cull"):
+            visible = self._cull(nodes, width, height)
+            if self.gallery is not None:
+                self._update_gallery(width, height)
+        with self.profiler.stage("render.draw", gpu=True):
+            graph = self.graph
+            for node, parts in zip(nodes, visible):
+                if parts is not None and not parts.any():
+                    continue
+                drawable = node.drawable
+                index = node.index
+                shader.set_mat4("model", graph.world[index])
+                shader.set_mat3("normalMatrix", graph.normal[index])
+                shader.set_vec3("positionOffset", drawable.position_offset)
+                shader.set_vec3("positionScale", drawable.position_scale)
+                shader.set_vec3("objectColor", node.color)
+                if isinstance(drawable, Mesh):
+                    drawable.select_lod(self.lod_triangle_budget(drawable, height, node), self.lod_hysteresis)
+                    drawable.draw(parts)
+                else:
+                    drawable.draw()
+        if self.gallery is not None:
+            with self.profiler.stage("render.instanced", gpu=True):
+                shader.set_int("instanced", 1)
+                for batch in self.gallery.batches:
+                    shader.set_vec3("positionOffset", batch.drawable.position_offset)
+                    shader.set_vec3("positionScale", batch.drawable.position_scale)
+                    batch.draw()
+                shader.set_int("instanced", 0)
+
+    def _update_shadows(self, nodes):
+        """Re-render the shadow maps of the active lights that went stale."""
+        batches = self.gallery.batches if self.gallery is not None else []
+        key = (self.graph.version,
+               tuple((n.index, id(n.drawable), getattr(n.drawable, 'is_ready', True)) for n in nodes),
+               tuple((id(b), b.drawable.is_ready) for b in batches))
+        if key != self._shadow_key:
+            self._shadow_key = key
+            self._shadow_bounds = self._scene_bounds(nodes, batches)
         if self.light_mode == self.LIGHT_MODE_SUN:
-            return [self.sun.get_light_data()]
+            lights = [(SunLight.SLOT, self.sun)]
         else:
-            data = self.spotlights.get_all_light_data()
-            if not data:
-                # Default spotlight if none added yet
-                return [{'type': 1, 'position': [0, 5, 0], 'direction': [0, -1, 0],
-                         'color': [1, 1, 1], 'intensity': 1.5, 'cutoff': 0.0, 'outerCutoff': 0.0}]
-            return data
+            lights = list(enumerate(self.spotlights.lights or [self.spotlights.default_light],
+                                    SpotLightManager.FIRST_SLOT))
+        self.shadows.update(lights, key, self._shadow_bounds, self._draw_shadow_casters)
 
-    def render(self, shader, width, height):
+    def _scene_bounds(self, nodes, batches):
+        """World AABB (2, 3) of every drawable with bounds, or None."""
+        boxes = [transform_aabbs(np.asarray(n.drawable.bounds, dtype=np.float64),
+                                 np.broadcast_to(self.graph.world[n.index].astype(np.float64),
+                                                 (len(n.drawable.bounds), 4, 4)))
+                 for n in nodes if getattr(n.drawable, 'bounds', None) is not None]
+        boxes += [b.world_bounds for b in batches if b.count]
+        if not boxes:
+            return None
+        boxes = np.concatenate(boxes)
+        return np.stack([boxes[:, 0].min(axis=0), boxes[:, 1].max(axis=0)])
+
+    def _draw_shadow_casters(self, shader):
+        """Draw everything that casts shadows with the depth program bound."""
+        graph = self.graph
+        for node in graph.drawables():
+            drawable = node.drawable
+            shader.set_mat4("model", graph.world[node.index])
+            shader.set_vec3("positionOffset", drawable.position_offset)
+            shader.set_vec3("positionScale", drawable.position_scale)
+            if isinstance(drawable, Mesh):
+                drawable.draw(level=self.shadow_lod_level)
+            else:
+                getattr(drawable, 'draw_shadow', drawable.draw)()
+        if self.gallery is not None:
+            shader.set_int("instanced", 1)
+            for batch in self.gallery.batches:
+                shader.set_vec3("positionOffset", batch.drawable.position_offset)
+                shader.set_vec3("positionScale", batch.drawable.position_scale)
+                batch.draw_all(self.instance_shadow_lod_level)
+            shader.set_int("instanced", 0)
+
+    def _update_gallery(self, width, height):
+        """Cull the gallery's instances and pick their LOD levels, when the view
+        or the set of uploaded models changed."""
+        ready = sum(1 for m in self.meshes if m.is_ready)
+        key = (self.camera.version, width, height, ready)
+        if key == self._gallery_key:
+            return
+        self._gallery_key = key
+        clip = self._clip_matrix(width, height)
+        total, visible = self.gallery.update(self.meshes, frustum_planes(clip), self.camera.position,
+                                             self.lod_scale(height), self.lod_hysteresis)
+        self.cull_stats.update(instances=total, visible_instances=visible)
+
+    def _cull(self, nodes, width, height):
+        """Visibility per drawable node: a boolean mask over its parts, or None.
+
+        A drawable's parts are the rows of its bounds attribute (a Mesh's
+        chunks); drawables without bounds are always drawn (None). Fills
+        self.cull_stats.
+        """
+        parts = [(node.index, getattr(node.drawable, 'bounds', None)) for node in nodes]
+        if not self.frustum_culling:
+            self.cull_stats.update(objects=len(nodes), visible_objects=len(nodes), parts=0, visible_parts=0)
+            return [None] * len(nodes)
+        view_key = (self.camera.version, width, height)
+        same_parts = (self._cull_parts is not None and len(parts) == len(self._cull_parts)
+                      and all(a[0] == b[0] and a[1] is b[1] for a, b in zip(parts, self._cull_parts)))
+        moved = self._cull_version != self.graph.version
+        if same_parts and not moved and view_key == self._cull_view:
+            return self._visible
+        if not same_parts or moved:
+            items, owners, self._part_ranges = [], [], []
+            start = 0
+            for node_index, bounds in parts:
+                if bounds is None:
+                    self._part_ranges.append(None)
+                    continue
+                items.append(np.asarray(bounds, dtype=np.float64))
+                owners.append(np.full(len(bounds), node_index))
+                self._part_ranges.append(slice(start, start + len(bounds)))
+                start += len(bounds)
+            item_bounds = np.concatenate(items) if items else np.zeros((0, 2, 3))
+            owner = np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64)
+            world_bounds = transform_aabbs(item_bounds, self.graph.world[owner].astype(np.float64))
+            if same_parts:
+                self._bvh.refit(world_bounds)
+            else:
+                self._bvh = BVH(world_bounds)
+            self._cull_parts = parts
+            self._cull_version = self.graph.version
+        self._cull_view = view_key
+        mask = self._bvh.cull(frustum_planes(self._clip_matrix(width, height)))
+        self._visible = [None if r is None else mask[r] for r in self._part_ranges]
+        self.cull_stats.update(
+            objects=len(nodes),
+            visible_objects=sum(1 for v in self._visible if v is None or v.any()),
+            parts=len(mask),
+            visible_parts=int(mask.sum()))
+        return self._visible
+
+    def culling_summary(self):
+        """Culled objects (and mesh chunks) of the last frame, for the window title."""
+        stats = self.cull_stats
+        text = f"Culled {stats['objects'] - stats['visible_objects']}/{stats['objects']} objects"
+        if stats['parts'] > stats['objects']:
+            text += f", {stats['parts'] - stats['visible_parts']}/{stats['parts']} chunks"
+        if stats['instances']:
+            text += f", {stats['instances'] - stats['visible_instances']}/{stats['instances']} instances"
+        return text
+
+    def lod_triangle_budget(self, mesh, height, node=None):
+        """Triangles worth drawing for a mesh, from its projected size in pixels.
+
+        The bounding sphere (scaled by the node's world matrix) is projected
+        with the same vertical FOV as the projection matrix; the covered area
+        divided by lod_pixels_per_triangle is the budget.
+        """
+        node = node or self.statue
+        world = self.graph.world[node.index]
+        radius = mesh.bounds_radius * float(np.linalg.norm(world[:3, :3], axis=0).max())
+        distance = float(np.linalg.norm(self.camera.position - world[:3, 3]))
+        if distance <= radius:
+            return float('inf')
+        return self.lod_scale(height) * (radius / distance) ** 2
+
+    def lod_scale(self, height):
+        """Triangle budget of a sphere whose radius/distance ratio is 1."""
+        radius_px = height / (2.0 * math.tan(math.radians(self.fov) / 2.0))
+        return math.pi * radius_px * radius_px / self.lod_pixels_per_triangle
+
+    def _set_frame_uniforms(self, shader, width, height):
         shader.use()
 
-        # Projection
-        aspect = width / height if height > 0 else 1.0
-        proj = perspective(45.0, aspect, 0.1, 100.0)
-        view = self.camera.get_view_matrix()
-        mesh = self.meshes[self.active_mesh_index]
-        lift = self.pedestal_top_y - mesh.bottom_y
-        #print(f"bottom_y={mesh.bottom_y:.3f}  pedestal_top_y={self.pedestal_top_y:.3f}  lift={lift:.3f}")
-        model = translate(0, lift, 0)
-        norm_mat = normal_matrix(model)
-
-        shader.set_mat4("projection", proj)
-        shader.set_mat4("view", view)
-        shader.set_mat4("model", model)
-        shader.set_mat3("normalMatrix", norm_mat)
-        shader.set_vec3("viewPos", self.camera.position.tolist())
-        shader.set_vec3("objectColor", self.object_color)
+        # Shader skips uploads of uniforms whose values did not change
+        shader.set_mat4("projection", self.get_projection(width, height))
+        shader.set_mat4("view", self.camera.get_view_matrix())
+        shader.set_vec3("viewPos", self.camera.position)
         shader.set_float("ambientStrength", self.ambient_strength)
 
-        # Set lights
-        lights = self.get_active_lights()
-        shader.set_int("numLights", len(lights))
-        for i, light in enumerate(lights):
-            prefix = f"lights[{i}]"
-            shader.set_int(f"{prefix}.type", light['type'])
-            shader.set_vec3(f"{prefix}.position", light['position'])
-            shader.set_vec3(f"{prefix}.direction", light['direction'])
-            shader.set_vec3(f"{prefix}.color", light['color'])
-            shader.set_float(f"{prefix}.intensity", light['intensity'])
-            shader.set_float(f"{prefix}.cutoff", light['cutoff'])
-            shader.set_float(f"{prefix}.outerCutoff", light['outerCutoff'])
-
-        # Draw active mesh
-        if self.meshes:
-            self.meshes[self.active_mesh_index].draw()
+        # Lights live in a uniform buffer; re-uploaded only when changed
+        if self.light_mode == self.LIGHT_MODE_SUN:
+            self.light_buffer.set_range(SunLight.SLOT, 1)
+        else:
+            self.light_buffer.set_range(SpotLightManager.FIRST_SLOT, self.spotlights.active_count)
+        shader.bind_uniform_block(LightBuffer.BLOCK_NAME, LightBuffer.BINDING)
+        self.light_buffer.upload()
+        # Samplers of different types must not share a texture unit, even unused
+        shader.set_int("shadowMaps", ShadowMaps.TEXTURE_UNIT)
+        shader.set_int("clusterGrid", LightClusters.GRID_UNIT)
+        shader.set_int("clusterLights", LightClusters.INDEX_UNIT)
+        if self.shadows is not None:
+            self.shadows.bind()
+
+    def _update_clusters(self, shader, width, height):
+        """Assign the active lights to clusters when they or the view changed."""
+        shader.set_int("clustered", int(self.clustered_lighting))
+        if not self.clustered_lighting:
+            return
+        self.light_clusters.update(self.camera.get_view_matrix(), self.fov, self._aspect(width, height),
+                                   self.near_plane, self.far_plane)
+        self.light_clusters.bind(shader, width, height)
 
     def cleanup(self):
-        for mesh in self.meshes:
-            mesh.cleanup()
+        self._shutdown_pool()
+        self._pending.clear()
+        self.residency.release_all()
+        self.light_buffer.cleanup()
+        self.light_clusters.cleanup()
+        if self.shadows is not None:
+            self.shadows.cleanup()
+        if self.gallery is not None:
+            self.gallery.cleanup()
@@ -0,0 +1,175 @@
+import numpy as np
+from engine.transform import normal_matrices, trs_matrices
+
+IDENTITY_ROTATION = (0.0, 0.0, 0.0, 1.0)
+
+
+class Node:
+    """Handle to one node of a SceneGraph.
+
+    Assign translation/rotation/scale (rotation is a quaternion, see
+    transform.quat_axis_angle) instead of mutating the returned arrays, so
+    the node is marked dirty. drawable is anything with draw() (Mesh, Room).
+    """
+    __slots__ = ("graph", "index", "name", "drawable", "color")
+
+    def __init__(self, graph, index, name, drawable, color):
+        self.graph = graph
+        self.index = index
+        self.name = name
+        self.drawable = drawable
+        self.color = color
+
+    @property
+    def parent(self):
+        p = self.graph.parent[self.index]
+        return self.graph.nodes[p] if p >= 0 else None
+
+    @property
+    def translation(self):
+        return self.graph.translation[self.index]
+
+    @translation.setter
+    def translation(self, value):
+        self.graph.set_translations([self.index], [value])
+
+    @property
+    def rotation(self):
+        return self.graph.rotation[self.index]
+
+    @rotation.setter
+    def rotation(self, value):
+        self.graph.set_rotations([self.index], [value])
+
+    @property
+    def scale(self):
+        return self.graph.scale[self.index]
+
+    @scale.setter
+    def scale(self, value):
+        self.graph.set_scales([self.index], [value])
+
+    @property
+    def world_matrix(self):
+        """World matrix as of the last SceneGraph.update()."""
+        return self.graph.world[self.index]
+
+    @property
+    def normal_matrix(self):
+        return self.graph.normal[self.index]
+
+
+class SceneGraph:
+    """Node hierarchy with local TRS and cached world/normal matrices.
+
+    All transforms live in NumPy arrays indexed by node, and parents are
+    always added before their children. update() recomputes only dirty
+    nodes: their local matrices in one batch, then world matrices one tree
+    depth at a time (a node is dirty if its parent is), then the normal
+    matrices of everything that changed. A static graph costs nothing.
+    """
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.nodes = []
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.depth = np.zeros(capacity, dtype=np.int64)
+        self.translation = np.zeros((capacity, 3), dtype=np.float32)
+        self.rotation = np.tile(np.array(IDENTITY_ROTATION, dtype=np.float32), (capacity, 1))
+        self.scale = np.ones((capacity, 3), dtype=np.float32)
+        self.local = np.tile(np.eye(4, dtype=np.float32), (capacity, 1, 1))
+        self.world = self.local.copy()
+        self.normal = np.tile(np.eye(3, dtype=np.float32), (capacity, 1, 1))
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.version = 0  # bumped by every update() that changed something
+        self._any_dirty = False
+        self._levels = None  # node indices grouped by depth, rebuilt after add()
+
+    def add(self, drawable=None, parent=None, name="", translation=(0.0, 0.0, 0.0),
+            rotation=IDENTITY_ROTATION, scale=(1.0, 1.0, 1.0), color=(0.7, 0.7, 0.75)):
+        if self.count == len(self.parent):
+            self._grow(2 * self.count)
+        i = self.count
+        self.count += 1
+        self.parent[i] = parent.index if parent is not None else -1
+        self.depth[i] = self.depth[parent.index] + 1 if parent is not None else 0
+        self.translation[i] = translation
+        self.rotation[i] = rotation
+        self.scale[i] = scale
+        self.dirty[i] = True
+        self._any_dirty = True
+        self._levels = None
+        node = Node(self, i, name, drawable, color)
+        self.nodes.append(node)
+        return node
+
+    def set_translations(self, indices, values):
+        """Batched assignment; indices is a sequence or array of node indices."""
+        self.translation[indices] = values
+        self._mark(indices)
+
+    def set_rotations(self, indices, values):
+        self.rotation[indices] = values
+        self._mark(indices)
+
+    def set_scales(self, indices, values):
+        self.scale[indices] = values
+        self._mark(indices)
+
+    def _mark(self, indices):
+        self.dirty[indices] = True
+        self._any_dirty = True
+
+    def update(self):
+        """Bring world and normal matrices up to date; returns how many changed."""
+        if not self._any_dirty:
+            return 0
+        n = self.count
+        dirty = self.dirty[:n]
+        changed_local = np.flatnonzero(dirty)
+        self.local[changed_local] = trs_matrices(self.translation[changed_local],
+                                                 self.rotation[changed_local],
+                                                 self.scale[changed_local])
+        for depth, level in enumerate(self._depth_levels()):
+            if depth > 0:
+                dirty[level] |= dirty[self.parent[level]]
+            sel = level[dirty[level]]
+            if not len(sel):
+                continue
+            if depth == 0:
+                self.world[sel] = self.local[sel]
+            else:
+                self.world[sel] = self.world[self.parent[sel]] @ self.local[sel]
+        changed = np.flatnonzero(dirty)
+        self.normal[changed] = normal_matrices(self.world[changed])
+        dirty[:] = False
+        self._any_dirty = False
+        self.version += 1
+        return len(changed)
+
+    def drawables(self):
+        return [node for node in self.nodes if node.drawable is not None]
+
+    def _depth_levels(self):
+        if self._levels is None:
+            depth = self.depth[:self.count]
+            order = np.argsort(depth, kind='stable')
+            bounds = np.searchsorted(depth[order], np.arange(depth.max() + 2))
+            self._levels = [order[bounds[d]:bounds[d + 1]] for d in range(len(bounds) - 1)]
+        return self._levels
+
+    def _grow(self, capacity):
+        extra = capacity - len(self.parent)
+
+        def grow(array, fill):
+            return np.concatenate([array, np.broadcast_to(fill, (extra,) + array.shape[1:]).astype(array.dtype)])
+
+        self.parent = grow(self.parent, -1)
+        self.depth = grow(self.depth, 0)
+        self.translation = grow(self.translation, 0.0)
+        self.rotation = grow(self.rotation, np.array(IDENTITY_ROTATION, dtype=np.float32))
+        self.scale = grow(self.scale, 1.0)
+        self.local = grow(self.local, np.eye(4, dtype=np.float32))
+        self.world = grow(self.world, np.eye(4, dtype=np.float32))
+        self.normal = grow(self.normal, np.eye(3, dtype=np.float32))
+        self.dirty = grow(self.dirty, False)
@@ -1,63 +1,293 @@
 import os
 from OpenGL.GL import *
 import numpy as np
+from engine.shader_cache import ProgramCache
 
+# Context-wide bindings shared by every Shader and mesh, so redundant
+# glUseProgram/glBindVertexArray calls can be skipped
+_bound = {'program': None, 'vao': None}
+
+
+def bind_vertex_array(vao):
+    if _bound['vao'] != vao:
+        glBindVertexArray(vao)
+        _bound['vao'] = vao
+
+
+def forget_vertex_array(vao):
+    """Call when deleting a VAO; GL unbinds it if it was bound."""
+    if _bound['vao'] == vao:
+        _bound['vao'] = 0
+
+
+_extensions = None
+
+
+def has_extension(name):
+    global _extensions
+    if _extensions is None:
+        _extensions = {glGetStringi(GL_EXTENSIONS, i).decode() for i in range(glGetIntegerv(GL_NUM_EXTENSIONS))}
+    return name in _extensions
+
+
+def enable_parallel_compile():
+    """Let the driver compile and link on its own threads (KHR/ARB_parallel_shader_compile).
+
+    Only pays off when several programs are started before any is checked:
+    build them with Shader(..., wait=False) and call finish() later.
+    Returns whether the driver supports it.
+    """
+    from OpenGL.GL.ARB.parallel_shader_compile import glMaxShaderCompilerThreadsARB
+    from OpenGL.GL.KHR.parallel_shader_compile import glMaxShaderCompilerThreadsKHR
+    # The extension can be listed while the entry point didn't resolve
+    for extension, set_threads in (("GL_KHR_parallel_shader_compile", glMaxShaderCompilerThreadsKHR),
+                                   ("GL_ARB_parallel_shader_compile", glMaxShaderCompilerThreadsARB)):
+        if has_extension(extension) and bool(set_threads):
+            set_threads(0xFFFFFFFF)  # as many threads as the driver likes
+            return True
+    return False
+
+
+def create_program_cache(cache_dir):
+    """ProgramCache for the current context's driver, or None if it can't
+    hand out program binaries."""
+    if not (bool(glProgramBinary) and bool(glGetProgramBinary) and bool(glProgramParameteri)):
+        return None
+    if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) <= 0:
+        return None
+    return ProgramCache(cache_dir, glGetString(GL_RENDERER).decode(), glGetString(GL_VERSION).decode())
 
-class Shader:
-    def __init__(self, vertex_path, fragment_path):
-        vertex_src = self._read_file(vertex_path)
-        fragment_src = self._read_file(fragment_path)
 
-        vertex_shader = self._compile(vertex_src, GL_VERTEX_SHADER)
-        fragment_shader = self._compile(fragment_src, GL_FRAGMENT_SHADER)
+class Shader:
+    """A vertex + fragment program.
 
-        self.program = glCreateProgram()
-        glAttachShader(self.program, vertex_shader)
-        glAttachShader(self.program, fragment_shader)
-        glLinkProgram(self.program)
+    With a ProgramCache the linked binary is stored after the first build
+    and loaded with glProgramBinary on later runs; a binary the driver
+    rejects falls back to compiling the sources. With wait=False the
+    constructor only starts compiling and linking, without asking for the
+    result: start several programs, then call finish() on each, and a
+    driver with parallel compilation works on all of them at once.
 
-        if glGetProgramiv(self.program, GL_LINK_STATUS) != GL_TRUE:
-            info = glGetProgramInfoLog(self.program).decode()
-            raise RuntimeError(f"Shader link error: {info}")
+    hot_reload keeps the compiled stages and lets reload_if_changed()
+    recompile just the stage whose file changed (development aid).
+    """
+    STAGE_NAMES = {GL_VERTEX_SHADER: "Vertex", GL_FRAGMENT_SHADER: "Fragment"}
 
-        glDeleteShader(vertex_shader)
-        glDeleteShader(fragment_shader)
+    def __init__(self, vertex_path, fragment_path, cache=None, wait=True, hot_reload=False):
+        self.paths = {GL_VERTEX_SHADER: vertex_path, GL_FRAGMENT_SHADER: fragment_path}
+        self.cache = cache
+        self.hot_reload = hot_reload
+        self.load_source = None  # "cache" or "source" once linked
+        self._mtimes = {stage: os.stat(path).st_mtime_ns for stage, path in self.paths.items()}
+        self._sources = {stage: self._read_file(path) for stage, path in self.paths.items()}
+        self._stages = {}  # stage type -> compiled shader object, kept with hot_reload
+        self._linking = False
 
         self._uniform_cache = {}
+        self._uniform_values = {}  # location -> last uploaded value
+        self._block_bindings = {}
+
+        self.program = self._load_cached()
+        if self.program is not None:
+            self.load_source = "cache"
+        else:
+            self._stages = {stage: self._start_compile(source, stage) for stage, source in self._sources.items()}
+            self.program = self._start_link(self._stages)
+            self._linking = True
+        if wait:
+            self.finish()
+
+    def _cache_key(self):
+        return self.cache.key(self._sources[GL_VERTEX_SHADER], self._sources[GL_FRAGMENT_SHADER])
+
+    def _load_cached(self):
+        if self.cache is None:
+            return None
+        entry = self.cache.load(self._cache_key())
+        if entry is None:
+            return None
+        binary_format, binary = entry
+        program = glCreateProgram()
+        glProgramBinary(program, binary_format, binary, len(binary))
+        if glGetProgramiv(program, GL_LINK_STATUS) == GL_TRUE:
+            return program
+        glDeleteProgram(program)
+        self.cache.discard(self._cache_key())  # driver changed under the same strings; rebuild it
+        return None
+
+    def finish(self):
+        """Wait for the link started by the constructor and check it (raises
+        RuntimeError with the compile or link log on failure)."""
+        if not self._linking:
+            return
+        self._linking = False
+        try:
+            self._check_link(self.program, self._stages)
+        except RuntimeError:
+            self._delete_stages(self._stages)
+            raise
+        self.load_source = "source"
+        self._store_binary()
+        if not self.hot_reload:
+            self._delete_stages(self._stages)
+
+    def _store_binary(self):
+        if self.cache is None:
+            return
+        size = int(glGetProgramiv(self.program, GL_PROGRAM_BINARY_LENGTH))
+        if size <= 0:
+            return
+        binary = np.empty(size, dtype=np.uint8)
+        length = GLsizei()
+        binary_format = GLenum()
+        glGetProgramBinary(self.program, size, length, binary_format, binary)
+        self.cache.store(self._cache_key(), binary_format.value, binary[:length.value].tobytes())
+
+    def reload_if_changed(self):
+        """Recompile the stages whose source file changed since the last build
+        and relink. On a compile or link error the error is printed and the
+        current program stays. Returns True when the program was replaced."""
+        changed = [stage for stage, path in self.paths.items() if os.stat(path).st_mtime_ns != self._mtimes[stage]]
+        if not changed:
+            return False
+        for stage in changed:
+            self._mtimes[stage] = os.stat(self.paths[stage]).st_mtime_ns
+            self._sources[stage] = self._read_file(self.paths[stage])
+        # Stages loaded from the binary cache were never compiled here
+        rebuild = [stage for stage in self.paths if stage in changed or stage not in self._stages]
+        stages = dict(self._stages)
+        new = {}
+        try:
+            for stage in rebuild:
+                new[stage] = stages[stage] = self._start_compile(self._sources[stage], stage)
+            program = self._start_link(stages)
+            try:
+                self._check_link(program, stages)
+            except RuntimeError:
+                glDeleteProgram(program)
+                raise
+        except RuntimeError as e:
+            self._delete_stages(new)
+            print(f"Shader reload failed, keeping the previous program: {e}")
+            return False
+        self._delete_stages({stage: self._stages[stage] for stage in new if stage in self._stages})
+        self._stages = stages
+        if _bound['program'] == self.program:
+            _bound['program'] = None
+        glDeleteProgram(self.program)
+        self.program = program
+        self._uniform_cache.clear()  # locations and values belong to the old program
+        self._uniform_values.clear()
+        self._block_bindings.clear()
+        self._store_binary()
+        print(f"Reloaded shader: {', '.join(os.path.basename(self.paths[stage]) for stage in changed)}")
+        return True
 
     def use(self):
-        glUseProgram(self.program)
+        if _bound['program'] != self.program:
+            if self._linking:
+                self.finish()
+            glUseProgram(self.program)
+            _bound['program'] = self.program
+
+    def _changed(self, loc, value):
+        """Record value as the current one for loc; False if it was already set."""
+        if self._uniform_values.get(loc) == value:
+            return False
+        self._uniform_values[loc] = value
+        return True
 
     def _get_loc(self, name):
         if name not in self._uniform_cache:
             self._uniform_cache[name] = glGetUniformLocation(self.program, name)
         return self._uniform_cache[name]
 
+    def bind_uniform_block(self, name, binding):
+        """Attach a uniform block to a binding point (once per block)."""
+        if self._block_bindings.get(name) == binding:
+            return
+        index = glGetUniformBlockIndex(self.program, name)
+        if index != GL_INVALID_INDEX:
+            glUniformBlockBinding(self.program, index, binding)
+        self._block_bindings[name] = binding
+
+    # The setters upload only when the value differs from the last one sent
+    # for that uniform; the program must be bound (use()) as before.
     def set_int(self, name, value):
-        glUniform1i(self._get_loc(name), value)
+        loc = self._get_loc(name)
+        if self._changed(loc, value):
+            glUniform1i(loc, value)
 
     def set_float(self, name, value):
-        glUniform1f(self._get_loc(name), value)
+        loc = self._get_loc(name)
+        if self._changed(loc, value):
+            glUniform1f(loc, value)
+
+    def set_ivec3(self, name, value):
+        loc = self._get_loc(name)
+        value = tuple(value)
+        if self._changed(loc, value):
+            glUniform3i(loc, *value)
+
+    def set_vec2(self, name, value):
+        loc = self._get_loc(name)
+        value = tuple(value)
+        if self._changed(loc, value):
+            glUniform2f(loc, *value)
 
     def set_vec3(self, name, value):
-        glUniform3f(self._get_loc(name), *value)
+        loc = self._get_loc(name)
+        value = tuple(value)
+        if self._changed(loc, value):
+            glUniform3f(loc, *value)
 
     def set_mat3(self, name, value):
-        glUniformMatrix3fv(self._get_loc(name), 1, GL_TRUE, np.array(value, dtype=np.float32))
+        loc = self._get_loc(name)
+        value = np.asarray(value, dtype=np.float32)
+        if self._changed(loc, value.tobytes()):
+            glUniformMatrix3fv(loc, 1, GL_TRUE, value)
 
     def set_mat4(self, name, value):
-        glUniformMatrix4fv(self._get_loc(name), 1, GL_TRUE, np.array(value, dtype=np.float32))
+        loc = self._get_loc(name)
+        value = np.asarray(value, dtype=np.float32)
+        if self._changed(loc, value.tobytes()):
+            glUniformMatrix4fv(loc, 1, GL_TRUE, value)
 
     def _read_file(self, path):
         with open(path, 'r') as f:
             return f.read()
 
-    def _compile(self, source, shader_type):
+    def _start_compile(self, source, shader_type):
+        """Create and compile a stage; its status is only checked after linking."""
         shader = glCreateShader(shader_type)
         glShaderSource(shader, source)
         glCompileShader(shader)
-        if glGetShaderiv(shader, GL_COMPILE_STATUS) != GL_TRUE:
-            info = glGetShaderInfoLog(shader).decode()
-            kind = "Vertex" if shader_type == GL_VERTEX_SHADER else "Fragment"
-            raise RuntimeError(f"{kind} shader compile error: {info}")
         return shader
+
+    def _start_link(self, stages):
+        program = glCreateProgram()
+        for shader in stages.values():
+            glAttachShader(program, shader)
+        if self.cache is not None:
+            glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        glLinkProgram(program)
+        for shader in stages.values():
+            glDetachShader(program, shader)
+        return program
+
+    def _check_link(self, program, stages):
+        # Querying the status is what waits for a parallel compile/link
+        if glGetProgramiv(program, GL_LINK_STATUS) == GL_TRUE:
+            return
+        for shader_type, shader in stages.items():
+            if glGetShaderiv(shader, GL_COMPILE_STATUS) != GL_TRUE:
+                info = glGetShaderInfoLog(shader).decode()
+                raise RuntimeError(f"{self.STAGE_NAMES[shader_type]} shader compile error: {info}")
+        info = glGetProgramInfoLog(program).decode()
+        raise RuntimeError(f"Shader link error: {info}")
+
+    @staticmethod
+    def _delete_stages(stages):
+        for shader in stages.values():
+            glDeleteShader(shader)
+        stages.clear()
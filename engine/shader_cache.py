@@ -0,0 +1,59 @@
+import hashlib
+import os
+import struct
+
+
+class ProgramCache:
+    """On-disk cache of linked program binaries (glGetProgramBinary).
+
+    An entry is keyed by the hash of the program's GLSL sources plus the
+    driver's GL_RENDERER and GL_VERSION strings, so a driver update or an
+    edited shader simply misses. Each file is MAGIC, the binary format
+    (uint32) and the driver's opaque binary. The driver may still reject a
+    binary (glProgramBinary leaves the program unlinked); Shader then
+    compiles from source and stores a fresh entry.
+    """
+    MAGIC = b"CGPROG01"
+
+    def __init__(self, cache_dir, renderer, version):
+        self.cache_dir = cache_dir
+        self.driver = f"{renderer}|{version}"
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, *sources):
+        h = hashlib.blake2b(self.driver.encode(), digest_size=16)
+        for source in sources:
+            h.update(b"\0")
+            h.update(source.encode())
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    def load(self, key):
+        """Return (binary_format, binary bytes) or None on a miss."""
+        try:
+            with open(self.entry_path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        header = len(self.MAGIC) + 4
+        if len(data) <= header or not data.startswith(self.MAGIC):
+            return None
+        (binary_format,) = struct.unpack_from("<I", data, len(self.MAGIC))
+        return binary_format, data[header:]
+
+    def store(self, key, binary_format, binary):
+        path = self.entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack("<I", binary_format))
+            f.write(binary)
+        os.replace(tmp_path, path)
+
+    def discard(self, key):
+        try:
+            os.remove(self.entry_path(key))
+        except OSError:
+            pass
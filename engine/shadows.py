@@ -0,0 +1,180 @@
+import math
+import numpy as np
+from OpenGL.GL import *
+from engine.light import MAX_SHADOW_MAPS, SunLight
+from engine.transform import look_at, orthographic, perspective
+
+
+def _up_for(direction):
+    """An up vector that is not parallel to direction, for look_at."""
+    return (1.0, 0.0, 0.0) if abs(direction[1]) > 0.99 else (0.0, 1.0, 0.0)
+
+
+def _corners(bounds):
+    lo, hi = np.asarray(bounds, dtype=np.float64)
+    return np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+
+
+def sun_light_space(direction, bounds):
+    """Orthographic projection @ view of a directional light, fitted to a (2, 3) AABB."""
+    direction = np.asarray(direction, dtype=np.float64)
+    center = np.mean(bounds, axis=0)
+    radius = max(float(np.linalg.norm(bounds[1] - bounds[0])) / 2.0, 1e-3)
+    view = look_at(center - direction * 2.0 * radius, center, _up_for(direction))
+    corners = _corners(bounds) @ view[:3, :3].T.astype(np.float64) + view[:3, 3]
+    lo, hi = corners.min(axis=0), corners.max(axis=0)
+    # Looking down -z: depth is -z
+    projection = orthographic(lo[0], hi[0], lo[1], hi[1], max(-hi[2] - 0.01, 1e-3), -lo[2] + 0.01)
+    return projection @ view
+
+
+def spot_light_space(light, bounds):
+    """Perspective projection @ view covering a spotlight's outer cone, out to
+    the farthest corner of a (2, 3) AABB."""
+    position = np.asarray(light.position, dtype=np.float64)
+    direction = np.asarray(light.direction, dtype=np.float64)
+    fov = 2.0 * math.degrees(math.acos(light.outer_cutoff)) + 2.0  # a little past the cone edge
+    far = max(float(np.linalg.norm(_corners(bounds) - position, axis=1).max()), 1.0)
+    view = look_at(position, position + direction, _up_for(direction))
+    return perspective(min(fov, 170.0), 1.0, 0.05, far) @ view
+
+
+class ShadowMaps:
+    """Depth maps of the sun and the spotlights, one layer of a texture array each.
+
+    Layer 0 is the sun's and layers 1.. go to the first spotlights with
+    casts_shadows set, in slot order, up to MAX_SHADOW_MAPS; the others are
+    unshadowed. A light's Light record holds its layer (shadow_layer) and
+    the LightBlock the layer's light-space matrix, so fragment.glsl finds
+    both. A layer is rendered again only when its light or the shadow
+    casters changed: spotlights don't move, so theirs are rendered once per
+    caster change, and the sun's when the sun has turned more than
+    sun_angle_step degrees since its last render (in between the shadow
+    trails the light by less than that). At most updates_per_frame layers
+    are rendered per frame; the rest wait for later frames, keeping their
+    previous map if the light and layer are the same and no shadow
+    otherwise. Spotlights without a cone (the default light) have no map.
+    """
+    TEXTURE_UNIT = 1
+
+    def __init__(self, shader, light_buffer, size=1024, sun_angle_step=2.0, updates_per_frame=2,
+                 polygon_offset=(2.0, 4.0)):
+        self.shader = shader  # depth-only program (shadow_vertex.glsl / shadow_fragment.glsl)
+        self.light_buffer = light_buffer
+        self.size = size
+        self.sun_angle_step = sun_angle_step
+        self.updates_per_frame = updates_per_frame
+        self.polygon_offset = polygon_offset
+        self.texture = None
+        self.fbo = None
+        self.pending = 0  # stale layers left for later frames by the last update
+        self._rendered = {}  # slot -> (casters key, light, layer, sun angle) of the light's map
+
+    def update(self, lights, casters_key, bounds, draw_casters):
+        """Re-render the stale layers among lights, within the per-frame budget.
+
+        lights is a list of (slot, light) of the active lights in priority
+        order; casters_key changes whenever the shadow casters do; bounds is
+        the (2, 3) AABB of everything that casts or receives shadows; and
+        draw_casters(shader) draws the casters with the depth program bound.
+        Returns the number of layers rendered.
+        """
+        stale = []
+        next_layer = 1
+        for slot, light in lights:
+            if isinstance(light, SunLight):
+                layer = 0
+            elif light.cutoff > 0.0 and light.casts_shadows and next_layer < MAX_SHADOW_MAPS:
+                layer = next_layer
+                next_layer += 1
+            else:
+                layer = None
+            state = self._rendered.get(slot)
+            if state is not None and (state[1] is not light or state[2] != layer):
+                self._forget(slot)  # the slot's light or layer changed; its old map is wrong
+                state = None
+            if layer is None:
+                continue
+            if state is None or state[0] != casters_key:
+                stale.append((slot, light, layer))
+            elif isinstance(light, SunLight) and \
+                    abs((light.angle - state[3] + 180.0) % 360.0 - 180.0) > self.sun_angle_step:
+                stale.append((slot, light, layer))
+        if not stale or bounds is None:
+            self.pending = 0
+            return 0
+        self.pending = max(len(stale) - self.updates_per_frame, 0)
+        stale = stale[:self.updates_per_frame]
+
+        framebuffer = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        self._ensure_resources()
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.size, self.size)
+        glEnable(GL_POLYGON_OFFSET_FILL)
+        glPolygonOffset(*self.polygon_offset)
+        self.shader.use()
+        for slot, light, layer in stale:
+            if isinstance(light, SunLight):
+                light_space = sun_light_space(light.direction, bounds)
+            else:
+                light_space = spot_light_space(light, bounds)
+            glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.texture, 0, layer)
+            glClear(GL_DEPTH_BUFFER_BIT)
+            self.shader.set_mat4("lightSpace", light_space)
+            draw_casters(self.shader)
+            self.light_buffer.lights[slot]['shadow_layer'] = layer
+            self.light_buffer.shadow_matrices[layer] = light_space.T  # column-major for std140
+            self.light_buffer.mark_dirty()
+            self._rendered[slot] = (casters_key, light, layer, getattr(light, 'angle', None))
+        glDisable(GL_POLYGON_OFFSET_FILL)
+        glBindFramebuffer(GL_FRAMEBUFFER, int(framebuffer))
+        glViewport(*[int(v) for v in viewport])
+        return len(stale)
+
+    def _forget(self, slot):
+        del self._rendered[slot]
+        self.light_buffer.lights[slot]['shadow_layer'] = -1
+        self.light_buffer.mark_dirty()
+
+    def _ensure_resources(self):
+        if self.texture is not None:
+            return
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture)
+        glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_DEPTH_COMPONENT24, self.size, self.size, MAX_SHADOW_MAPS, 0,
+                     GL_DEPTH_COMPONENT, GL_FLOAT, None)
+        # Hardware depth comparison with bilinear filtering (sampler2DArrayShadow);
+        # outside the map everything is lit
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
+        glTexParameterfv(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_BORDER_COLOR, [1.0, 1.0, 1.0, 1.0])
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_MODE, GL_COMPARE_REF_TO_TEXTURE)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_FUNC, GL_LEQUAL)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.texture, 0, 0)
+        glDrawBuffer(GL_NONE)
+        glReadBuffer(GL_NONE)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Shadow map framebuffer is incomplete")
+
+    def bind(self):
+        """Bind the texture array to TEXTURE_UNIT for the lighting pass."""
+        if self.texture is None:
+            return
+        glActiveTexture(GL_TEXTURE0 + self.TEXTURE_UNIT)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture)
+        glActiveTexture(GL_TEXTURE0)
+
+    def cleanup(self):
+        if self.texture is not None:
+            glDeleteTextures(1, [self.texture])
+            glDeleteFramebuffers(1, [self.fbo])
+            self.texture = self.fbo = None
+        for slot in list(self._rendered):
+            self._forget(slot)
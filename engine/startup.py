@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """Wall-clock breakdown of the launch, for main.py's console.
+
+    phase(name) times a block; a phase entered several times adds up, so
+    work that is started early and collected later (shader builds) counts
+    once. mark(name) records when something happened, relative to start,
+    the first time it is called. Only the standard library is imported
+    here, so the report can time the imports of everything else.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases = {}  # name -> seconds, in first-entered order
+        self.marks = {}   # name -> seconds since start
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - begin)
+
+    def mark(self, name):
+        """Record name's time since start; returns True the first time."""
+        if name in self.marks:
+            return False
+        self.marks[name] = time.perf_counter() - self.start
+        return True
+
+    def summary(self, until):
+        """Phases in order, then the elapsed time up to mark until."""
+        parts = [f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items()]
+        return f"{' | '.join(parts)} -> {until} at {self.marks[until] * 1000:.0f} ms"
@@ -0,0 +1,101 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from engine.shader import bind_vertex_array, forget_vertex_array
+
+
+class StaticGeometry:
+    """Indexed environment meshes (room shell, pedestal, grid) sharing one VBO/EBO.
+
+    Parts are float32 position + normal vertices with triangle indices.
+    Indices are rebased as parts are added, so any set of parts is drawn by
+    one glMultiDrawElements on one VAO. Parts added after the first upload
+    are picked up on the next draw; the buffer objects keep their names, so
+    VAOs built on them elsewhere (engine.instancing) stay valid.
+    """
+    STRIDE = 6 * 4  # position + normal, float32
+
+    def __init__(self):
+        self.vao = None
+        self.vbo = None
+        self.ebo = None
+        self.parts = {}  # name -> (first_index, index_count)
+        self._vertices = []
+        self._indices = []
+        self._vertex_count = 0
+        self._index_count = 0
+        self._dirty = False
+
+    def add(self, name, vertices, indices):
+        """Append a part: (N, 6) float32 vertices and a flat index array local to them."""
+        vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 6)
+        indices = np.asarray(indices, dtype=np.uint32) + np.uint32(self._vertex_count)
+        self.parts[name] = (self._index_count, len(indices))
+        self._vertices.append(vertices)
+        self._indices.append(indices)
+        self._vertex_count += len(vertices)
+        self._index_count += len(indices)
+        self._dirty = True
+
+    @property
+    def is_ready(self):
+        return bool(self.parts)
+
+    def upload(self):
+        """(Re)fill the buffers; only GL_COPY_WRITE_BUFFER is rebound, so this is
+        safe while any VAO is bound."""
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+            self.ebo = glGenBuffers(1)
+        for buffer, data in ((self.vbo, np.concatenate(self._vertices)), (self.ebo, np.concatenate(self._indices))):
+            glBindBuffer(GL_COPY_WRITE_BUFFER, buffer)
+            glBufferData(GL_COPY_WRITE_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        self._dirty = False
+
+    def bind_vertex_attributes(self):
+        """Attach the VBO/EBO and attributes 0-1 to the bound VAO."""
+        if self._dirty:
+            self.upload()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, self.STRIDE, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, self.STRIDE, ctypes.c_void_p(3 * 4))
+        glEnableVertexAttribArray(1)
+
+    def draw(self, names):
+        """Draw the named parts with a single call."""
+        if self._dirty:
+            self.upload()
+        if self.vao is None:
+            self.vao = glGenVertexArrays(1)
+            bind_vertex_array(self.vao)
+            self.bind_vertex_attributes()
+        bind_vertex_array(self.vao)
+        ranges = [self.parts[name] for name in names]
+        if len(ranges) == 1:
+            first, count = ranges[0]
+            glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_INT, ctypes.c_void_p(4 * first))
+            return
+        counts = np.array([count for _, count in ranges], dtype=np.int32)
+        offsets = (ctypes.c_void_p * len(ranges))(*[4 * first for first, _ in ranges])
+        glMultiDrawElements(GL_TRIANGLES, counts, GL_UNSIGNED_INT, offsets, len(ranges))
+
+    def draw_instanced(self, name, instance_count):
+        """Draw one part instance_count times; the bound VAO supplies the instances."""
+        if self._dirty:
+            self.upload()
+        first, count = self.parts[name]
+        glDrawElementsInstanced(GL_TRIANGLES, count, GL_UNSIGNED_INT, ctypes.c_void_p(4 * first), instance_count)
+
+    def cleanup(self):
+        if self.vao is not None:
+            forget_vertex_array(self.vao)
+            glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            glDeleteBuffers(1, [self.ebo])
+            self.vbo = self.ebo = None
+            self._dirty = bool(self.parts)
@@ -2,30 +2,42 @@ import numpy as np
 import math
 
 
-def identity():
-    return np.eye(4, dtype=np.float32)
+def _output(out):
+    """out reset to the identity, or a new identity matrix."""
+    if out is None:
+        return np.eye(4, dtype=np.float32)
+    out.fill(0.0)
+    out[0, 0] = out[1, 1] = out[2, 2] = out[3, 3] = 1.0
+    return out
 
 
-def translate(x, y, z):
-    m = np.eye(4, dtype=np.float32)
+# The matrix builders below take an optional out: a (4, 4) float32 array
+# that is overwritten and returned instead of allocating a new one.
+
+def identity(out=None):
+    return _output(out)
+
+
+def translate(x, y, z, out=None):
+    m = _output(out)
     m[0, 3] = x
     m[1, 3] = y
     m[2, 3] = z
     return m
 
 
-def scale(sx, sy, sz):
-    m = np.eye(4, dtype=np.float32)
+def scale(sx, sy, sz, out=None):
+    m = _output(out)
     m[0, 0] = sx
     m[1, 1] = sy
     m[2, 2] = sz
     return m
 
 
-def rotate_y(angle_deg):
+def rotate_y(angle_deg, out=None):
     a = math.radians(angle_deg)
     c, s = math.cos(a), math.sin(a)
-    m = np.eye(4, dtype=np.float32)
+    m = _output(out)
     m[0, 0] = c
     m[0, 2] = s
     m[2, 0] = -s
@@ -33,39 +45,107 @@ def rotate_y(angle_deg):
     return m
 
 
-def perspective(fov_deg, aspect, near, far):
+def perspective(fov_deg, aspect, near, far, out=None):
     f = 1.0 / math.tan(math.radians(fov_deg) / 2.0)
-    m = np.zeros((4, 4), dtype=np.float32)
+    m = _output(out)
     m[0, 0] = f / aspect
     m[1, 1] = f
     m[2, 2] = (far + near) / (near - far)
     m[2, 3] = (2 * far * near) / (near - far)
     m[3, 2] = -1.0
+    m[3, 3] = 0.0
     return m
 
 
-def look_at(eye, target, up):
-    eye = np.array(eye, dtype=np.float32)
-    target = np.array(target, dtype=np.float32)
-    up = np.array(up, dtype=np.float32)
+def orthographic(left, right, bottom, top, near, far, out=None):
+    m = _output(out)
+    m[0, 0] = 2.0 / (right - left)
+    m[1, 1] = 2.0 / (top - bottom)
+    m[2, 2] = -2.0 / (far - near)
+    m[0, 3] = -(right + left) / (right - left)
+    m[1, 3] = -(top + bottom) / (top - bottom)
+    m[2, 3] = -(far + near) / (far - near)
+    return m
 
-    f = target - eye
-    f = f / np.linalg.norm(f)
 
-    s = np.cross(f, up)
-    s = s / np.linalg.norm(s)
+def look_at(eye, target, up, out=None):
+    # Plain float math: for 3-vectors it is much faster than NumPy and
+    # allocates no arrays
+    ex, ey, ez = (float(v) for v in eye)
+    ux, uy, uz = (float(v) for v in up)
+    fx, fy, fz = float(target[0]) - ex, float(target[1]) - ey, float(target[2]) - ez
+    n = math.sqrt(fx * fx + fy * fy + fz * fz)
+    fx, fy, fz = fx / n, fy / n, fz / n
+
+    sx, sy, sz = fy * uz - fz * uy, fz * ux - fx * uz, fx * uy - fy * ux
+    n = math.sqrt(sx * sx + sy * sy + sz * sz)
+    sx, sy, sz = sx / n, sy / n, sz / n
+
+    ux, uy, uz = sy * fz - sz * fy, sz * fx - sx * fz, sx * fy - sy * fx
+
+    m = _output(out)
+    m[0, 0], m[0, 1], m[0, 2] = sx, sy, sz
+    m[1, 0], m[1, 1], m[1, 2] = ux, uy, uz
+    m[2, 0], m[2, 1], m[2, 2] = -fx, -fy, -fz
+    m[0, 3] = -(sx * ex + sy * ey + sz * ez)
+    m[1, 3] = -(ux * ex + uy * ey + uz * ez)
+    m[2, 3] = fx * ex + fy * ey + fz * ez
+    return m
 
-    u = np.cross(s, f)
 
-    m = np.eye(4, dtype=np.float32)
-    m[0, 0:3] = s
-    m[1, 0:3] = u
-    m[2, 0:3] = -f
-    m[0, 3] = -np.dot(s, eye)
-    m[1, 3] = -np.dot(u, eye)
-    m[2, 3] = np.dot(f, eye)
+def normal_matrix(model, out=None):
+    """Inverse transpose of the upper 3x3 of an affine model matrix, into a
+    (3, 3) out if given.
+
+    Closed form, as normal_matrices: the cofactor matrix divided by the
+    determinant.
+    """
+    (a, b, c), (d, e, f), (g, h, i) = model[:3, :3].tolist()
+    c00, c01, c02 = e * i - f * h, f * g - d * i, d * h - e * g
+    det = a * c00 + b * c01 + c * c02
+    inv = 1.0 / det if det != 0.0 else 1.0
+    m = np.empty((3, 3), dtype=np.float32) if out is None else out
+    m[0, 0], m[0, 1], m[0, 2] = c00 * inv, c01 * inv, c02 * inv
+    m[1, 0], m[1, 1], m[1, 2] = (c * h - b * i) * inv, (a * i - c * g) * inv, (b * g - a * h) * inv
+    m[2, 0], m[2, 1], m[2, 2] = (b * f - c * e) * inv, (c * d - a * f) * inv, (a * e - b * d) * inv
     return m
 
 
-def normal_matrix(model):
-    return np.linalg.inv(model[:3, :3]).T
+def quat_axis_angle(axis, angle_deg):
+    """Unit quaternion (x, y, z, w) rotating angle_deg around axis."""
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    half = math.radians(angle_deg) / 2.0
+    return np.array([*(axis * math.sin(half)), math.cos(half)], dtype=np.float32)
+
+
+def trs_matrices(translations, rotations, scales):
+    """Batched translate * rotate * scale: (N, 3), (N, 4) quaternions, (N, 3) -> (N, 4, 4)."""
+    x, y, z, w = np.moveaxis(np.asarray(rotations, dtype=np.float32), -1, 0)
+    m = np.zeros((len(x), 4, 4), dtype=np.float32)
+    m[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    m[:, 0, 1] = 2 * (x * y - z * w)
+    m[:, 0, 2] = 2 * (x * z + y * w)
+    m[:, 1, 0] = 2 * (x * y + z * w)
+    m[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    m[:, 1, 2] = 2 * (y * z - x * w)
+    m[:, 2, 0] = 2 * (x * z - y * w)
+    m[:, 2, 1] = 2 * (y * z + x * w)
+    m[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    m[:, :3, :3] *= np.asarray(scales, dtype=np.float32)[:, None, :]
+    m[:, :3, 3] = translations
+    m[:, 3, 3] = 1.0
+    return m
+
+
+def normal_matrices(models):
+    """Batched inverse transpose of the upper 3x3 of (N, 4, 4) matrices.
+
+    Closed form: the columns of inverse(M)^T are the cross products of M's
+    columns divided by the determinant.
+    """
+    c0, c1, c2 = models[:, :3, 0], models[:, :3, 1], models[:, :3, 2]
+    cof = np.stack([np.cross(c1, c2), np.cross(c2, c0), np.cross(c0, c1)], axis=2)
+    det = np.einsum('ij,ij->i', c0, cof[:, :, 0])
+    det[det == 0] = 1.0
+    return (cof / det[:, None, None]).astype(np.float32)
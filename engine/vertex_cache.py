@@ -0,0 +1,130 @@
+from array import array
+from collections import deque
+import numpy as np
+
+
+def tipsify(indices, num_vertices, cache_size=16):
+    """Reorder a triangle list for post-transform vertex cache reuse.
+
+    Tipsify (Sander, Nehab, Barczak 2007): fan out from a vertex, emitting
+    all its remaining triangles, then continue from the 1-ring vertex that
+    is still in cache and has the fewest triangles left, falling back to a
+    stack of recently used vertices at dead ends. Linear time with no
+    per-triangle scoring; the adjacency is built with NumPy and the greedy
+    walk runs on plain lists and int32 memoryviews, the fastest way through
+    it in Python (about 2 s per million triangles, so it belongs in a load
+    worker).
+
+    Returns the reordered flat index array (same dtype as the input).
+    """
+    indices = np.asarray(indices)
+    num_tris = len(indices) // 3
+    if num_tris == 0:
+        return indices.copy()
+    corners = indices.astype(np.int32)
+    valence = np.bincount(corners, minlength=num_vertices)
+    offsets = np.concatenate([[0], np.cumsum(valence)]).tolist()
+    adjacency = np.argsort(corners, kind='stable').astype(np.int32)
+    adjacency //= 3  # triangles around each vertex
+    # Per-corner data stays int32 (memoryviews, array stacks): indexing yields
+    # ints as a list would, without a Python object per corner
+    adjacency = memoryview(adjacency)
+    live = valence.tolist()
+    flat = memoryview(corners)
+
+    cache_time = [-cache_size - 1] * num_vertices
+    emitted = bytearray(num_tris)
+    dead_end = array('i')
+    order = array('i')
+    stamp = 0
+    cursor = 0  # next vertex to try when the dead-end stack runs dry
+
+    fan = 0
+    while fan < num_vertices and live[fan] == 0:
+        fan += 1
+    while fan < num_vertices:
+        ring = []
+        for t in adjacency[offsets[fan]:offsets[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = 1
+            order.append(t)
+            base = 3 * t
+            for v in (flat[base], flat[base + 1], flat[base + 2]):
+                dead_end.append(v)
+                ring.append(v)
+                live[v] -= 1
+                if stamp - cache_time[v] > cache_size:
+                    cache_time[v] = stamp
+                    stamp += 1
+
+        # Next fan: a 1-ring vertex that will still be cached after its fan
+        best, best_priority = -1, -1
+        for v in ring:
+            if live[v] > 0:
+                priority = 0
+                age = stamp - cache_time[v]
+                if age + 2 * live[v] <= cache_size:
+                    priority = age
+                if priority > best_priority:
+                    best, best_priority = v, priority
+        if best < 0:
+            while dead_end and best < 0:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    best = v
+            while best < 0 and cursor < num_vertices:
+                if live[cursor] > 0:
+                    best = cursor
+                cursor += 1
+        if best < 0:
+            break
+        fan = best
+
+    tris = indices.reshape(-1, 3)
+    return tris[np.frombuffer(order, dtype=np.int32)].reshape(-1)
+
+
+def first_use_order(indices):
+    """Vertex fetch order: vertices numbered by first reference in the index list.
+
+    Returns (vertex_order, new_indices): gather the vertex array with
+    vertex_order and draw it with new_indices. Unreferenced vertices are
+    dropped.
+    """
+    _, first, inverse = np.unique(indices, return_index=True, return_inverse=True)
+    rank_order = np.argsort(first, kind='stable')
+    rank = np.empty_like(rank_order)
+    rank[rank_order] = np.arange(len(rank_order))
+    vertex_order = np.asarray(indices)[first[rank_order]]
+    return vertex_order, rank[inverse.ravel()].astype(np.asarray(indices).dtype)
+
+
+def acmr(indices, cache_size=32, window=100_000, windows=3):
+    """Average cache miss ratio (transformed vertices per triangle) of a FIFO cache.
+
+    1.0 or below is good, 3.0 means no reuse at all. Big meshes are sampled
+    in a few evenly spaced windows of `window` triangles, since the cache
+    only sees local order anyway.
+    """
+    indices = np.asarray(indices)
+    num_tris = len(indices) // 3
+    if num_tris == 0:
+        return 0.0
+    if num_tris <= window * windows:
+        starts = [0]
+        window = num_tris
+    else:
+        starts = np.linspace(0, num_tris - window, windows).astype(np.int64).tolist()
+    misses = 0
+    for start in starts:
+        cached = set()
+        fifo = deque()
+        for v in indices[3 * start:3 * (start + window)].tolist():
+            if v not in cached:
+                misses += 1
+                cached.add(v)
+                fifo.append(v)
+                if len(fifo) > cache_size:
+                    cached.discard(fifo.popleft())
+    return misses / (window * len(starts))
@@ -1,17 +1,21 @@
+import time
+_START = time.perf_counter()  # the startup report counts everything below as imports
+
+import argparse
 import os
 import sys
 import pygame
-from OpenGL.GL import *
-import numpy as np
 
-from engine.transform import identity, normal_matrix
-from engine.room import Room
-from engine.shader import Shader
-from engine.scene import Scene
-from engine.grid import Grid
-from engine.input_handler import InputHandler
-from engine.transform import perspective
+# PyOpenGL and the engine are imported in main() once the window is open,
+# and Room, Grid, Gallery and ShadowMaps only by the functions that create
+# them, so tools importing this module's helpers pay for what they use
+from engine.startup import StartupReport
+
+_IMPORTED = time.perf_counter()
+
 
+SCENARIOS = {"room": 1, "grid": 2, "gallery": 3}
+SCENARIO = None  # "room", "grid" or "gallery" starts without asking; --scenario overrides
 
 # Window settings
 WINDOW_WIDTH = 1280
@@ -21,6 +25,23 @@ WINDOW_TITLE = "CG Project - 3D Statue Viewer"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SHADERS_DIR = os.path.join(BASE_DIR, "shaders")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
+MESH_CACHE_DIR = os.path.join(BASE_DIR, ".mesh_cache")
+SHADER_CACHE_DIR = os.path.join(BASE_DIR, ".shader_cache")  # linked program binaries; None = always compile
+SHADER_HOT_RELOAD = False  # development: recompile a shader when its .glsl file is saved
+LOAD_WORKERS = None  # model parsing processes; None = one per CPU core
+LAZY_LOADING = True  # upload models on first view instead of all at startup
+GPU_BUDGET_MB = 1024  # models are evicted LRU above this much VRAM; None = no limit
+VERTEX_FORMAT = "float32"  # full precision; "compact" = 12-byte quantized vertices, half the VRAM
+CHUNK_TRIANGLES = 65536  # big models are split into chunks of this size, culled one by one; None = off
+PEDESTAL_SEGMENTS = 40  # pedestal cylinder quality; generated with NumPy, so more is nearly free
+GALLERY_PEDESTALS = 200  # scenario 3: every model, repeated over this many instanced pedestals
+SHADOW_MAP_SIZE = 1024  # per light; None = no shadows
+SHADOW_SUN_STEP = 2.0  # degrees the sun turns before its shadow map is rendered again
+SHADOW_UPDATES_PER_FRAME = 2  # shadow maps rendered per frame at most
+MAX_FPS = 60
+SUN_UPDATE_RATE = 30  # sun mode: frames per second spent on the orbiting sun; lower saves power
+IDLE_TIMEOUT = 1.0  # seconds an idle loop sleeps waiting for input before checking again
+PROFILE_TRACE_PATH = os.path.join(BASE_DIR, "frame_trace.json")
 
 
 def init_pygame():
@@ -41,6 +62,8 @@ def init_pygame():
 
 
 def init_opengl():
+    from OpenGL.GL import (GL_BLEND, GL_DEPTH_TEST, GL_MULTISAMPLE, GL_ONE_MINUS_SRC_ALPHA, GL_SRC_ALPHA,
+                           glBlendFunc, glClearColor, glEnable)
     glEnable(GL_DEPTH_TEST)
     glEnable(GL_MULTISAMPLE)
     glEnable(GL_BLEND)
@@ -61,148 +84,261 @@ def print_controls():
     print("  +/-              - Sun speed up/down")
     print("  Space            - Add spotlight")
     print("  C                - Clear spotlights")
+    print("  P                - Toggle frame profiler")
+    print("  T                - Export profiler trace (Chrome JSON)")
     print("  ESC              - Quit")
     print("=" * 50)
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument("--scenario", choices=SCENARIOS, default=SCENARIO,
+                        help="start with this scenario instead of asking")
+    return parser.parse_args()
+
+
 def main():
-    scenario = choose_scenario()
-    screen = init_pygame()
-    init_opengl()
+    args = parse_args()
+    startup = StartupReport(_START)
+    startup.add("imports", _IMPORTED - _START)
+    if args.scenario:
+        scenario = SCENARIOS[args.scenario]
+    else:
+        with startup.phase("prompt"):
+            scenario = choose_scenario()
+
+    with startup.phase("context"):
+        screen = init_pygame()
+    with startup.phase("imports"):
+        from OpenGL.GL import GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, glClear, glViewport
+        from engine.frame_scheduler import FrameScheduler
+        from engine.input_handler import InputHandler
+        from engine.profiler import FrameProfiler
+        from engine.scene import Scene
+        from engine.shader import create_program_cache, enable_parallel_compile
+        from engine.static_geometry import StaticGeometry
+    with startup.phase("context"):
+        init_opengl()
     print_controls()
 
-    # Load shaders
-    model_shader = Shader(
-        os.path.join(SHADERS_DIR, "vertex.glsl"),
-        os.path.join(SHADERS_DIR, "fragment.glsl"),
-    )
-    grid_shader = Shader(
-        os.path.join(SHADERS_DIR, "grid_vertex.glsl"),
-        os.path.join(SHADERS_DIR, "grid_fragment.glsl"),
-    )
+    # Start building every program; the driver compiles them (in parallel
+    # where supported) while the scene is set up, and finish() collects them
+    with startup.phase("shaders"):
+        enable_parallel_compile()
+        shader_cache = create_program_cache(SHADER_CACHE_DIR) if SHADER_CACHE_DIR else None
+        model_shader = load_shader("vertex.glsl", "fragment.glsl", shader_cache)
+        grid_shader = load_shader("grid_vertex.glsl", "grid_fragment.glsl", shader_cache)
+
+    # Models are only registered here and queued; they are parsed in the
+    # background and uploaded a little per frame, so the environment is on
+    # screen from the first frame
+    with startup.phase("scene"):
+        scene = Scene(
+            MODELS_DIR,
+            cache_dir=MESH_CACHE_DIR,
+            load_workers=LOAD_WORKERS,
+            lazy_loading=LAZY_LOADING,
+            gpu_budget_bytes=GPU_BUDGET_MB * 2**20 if GPU_BUDGET_MB else None,
+            vertex_format=VERTEX_FORMAT,
+            chunk_triangles=CHUNK_TRIANGLES,
+        )
+        scene.load_models()
+        if SHADOW_MAP_SIZE:
+            scene.shadows = create_shadow_maps(scene, shader_cache)
 
-    # Load scene
-    scene = Scene(MODELS_DIR)
-    scene.load_models()
-    
-    room = create_room() if scenario == 1 else None
-    grid = create_grid() if scenario == 2 else None
+        # Room, pedestal and grid share one VBO/EBO
+        environment = StaticGeometry()
+        room = create_room(environment) if scenario == 1 else None
+        grid = create_grid(environment) if scenario == 2 else None
 
-    if room:
-        scene.pedestal_top_y = room.pedestal_top_y
+        if room:
+            add_room(scene, room)
+        if scenario == 3:
+            gallery = create_gallery(len(scene.meshes), environment)
+            scene.set_gallery(gallery)
+            scene.spotlights.add(*gallery.spotlights())  # one per pedestal (key 2)
+
+    with startup.phase("shaders"):
+        shaders = [model_shader, grid_shader] + ([scene.shadows.shader] if scene.shadows else [])
+        for shader in shaders:
+            shader.finish()
 
     input_handler = InputHandler()
     clock = pygame.time.Clock()
+    profiler = FrameProfiler()
+    scene.profiler = profiler
+    # Frames are drawn only when something changed; otherwise the loop sleeps on input
+    scheduler = FrameScheduler(max_fps=MAX_FPS, sun_rate=SUN_UPDATE_RATE, idle_timeout=IDLE_TIMEOUT)
 
     width, height = WINDOW_WIDTH, WINDOW_HEIGHT
 
     while not input_handler.quit_requested:
-        dt = clock.tick(60) / 1000.0
+        profiler.begin_frame()
 
         # Process input
-        dx, dy = input_handler.process_events()
-
-        # Camera controls
-        if dx != 0 or dy != 0:
-            scene.camera.rotate(dx, -dy)
-        if input_handler.scroll_delta != 0:
-            scene.camera.zoom(input_handler.scroll_delta)
-
-        # Key events
-        for key in input_handler.key_events:
-            if key == pygame.K_ESCAPE:
-                input_handler.quit_requested = True
-            elif key == pygame.K_TAB:
-                scene.switch_model()
-            elif key == pygame.K_1:
-                scene.toggle_light_mode(Scene.LIGHT_MODE_SUN)
-            elif key == pygame.K_2:
-                scene.toggle_light_mode(Scene.LIGHT_MODE_SPOTLIGHTS)
-            elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
-                scene.sun.change_speed(10)
-                print(f"Sun speed: {scene.sun.speed:.0f} deg/s")
-            elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
-                scene.sun.change_speed(-10)
-                print(f"Sun speed: {scene.sun.speed:.0f} deg/s")
-            elif key == pygame.K_SPACE:
-                scene.spotlights.add_spotlight(
-                    scene.camera.position,
-                    scene.camera.target,
-                )
-            elif key == pygame.K_c:
-                scene.spotlights.clear()
+        with profiler.stage("process_events"):
+            dx, dy = input_handler.process_events()
+
+        with profiler.stage("input"):
+            handle_input(input_handler, scene, profiler, dx, dy)
 
         # Handle window resize
         current_size = pygame.display.get_surface().get_size()
         if current_size != (width, height):
             width, height = current_size
             glViewport(0, 0, width, height)
+        if input_handler.redraw_requested:
+            scheduler.request_redraw()
+        if SHADER_HOT_RELOAD and [shader for shader in shaders if shader.reload_if_changed()]:
+            scheduler.request_redraw()
+
+        if not scheduler.frame_due(scene, (width, height)):
+            profiler.discard_frame()
+            input_handler.wait(scheduler.wait_time(scene, (width, height)))
+            continue
+        frame_start = time.perf_counter()
+        dt = scheduler.begin_frame()
+        clock.tick()  # for get_fps
 
         # Update
-        scene.update(dt)
+        with profiler.stage("scene.update", gpu=True):
+            scene.update(dt)
 
         # Render
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        with profiler.stage("clear", gpu=True):
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        # Draw 3D model
-        scene.render(model_shader, width, height)
-
-        # Draw room
-        if room:
-            draw_room(room, model_shader)
+        # Draw the scene graph (statue, room)
+        with profiler.stage("scene.render"):
+            scene.render(model_shader, width, height)
 
         # Draw grid
         if grid:
-            draw_grid(grid, grid_shader, scene, width, height)
+            with profiler.stage("draw_grid", gpu=True):
+                draw_grid(grid, grid_shader, scene, width, height)
 
         # Update window title with info
-        mode_name = "Sun" if scene.light_mode == Scene.LIGHT_MODE_SUN else "Spotlights"
+        mode_name = "Sun" if scene.light_mode == scene.LIGHT_MODE_SUN else "Spotlights"
         model_name = scene.mesh_names[scene.active_mesh_index] if scene.mesh_names else "None"
+        if scene.meshes and len(scene.meshes[scene.active_mesh_index].lods) > 1:
+            model_name += f" (LOD {scene.meshes[scene.active_mesh_index].lod_level})"
         fps = clock.get_fps()
+        vram_mb = scene.residency.total_bytes / 2**20
+        loading = scene.loading_status()
+        stats = f"{profiler.summary()} | {scene.culling_summary()}" if profiler.enabled else None
         pygame.display.set_caption(
-            f"{WINDOW_TITLE} | Model: {model_name} | Light: {mode_name} | FPS: {fps:.0f}"
+            f"{WINDOW_TITLE} | Model: {model_name} | Light: {mode_name} | VRAM: {vram_mb:.0f} MB | FPS: {fps:.0f}"
+            + (f" | {loading}" if loading else "")
+            + (f" | {stats}" if stats else "")
         )
 
-        pygame.display.flip()
+        with profiler.stage("display.flip"):
+            pygame.display.flip()
+        scheduler.frame_drawn(scene, (width, height))
+        profiler.end_frame()
+
+        if startup.mark("first frame"):
+            startup.add("first frame", time.perf_counter() - frame_start)
+            print(f"Startup: {startup.summary('first frame')}")
+        if loading is None and startup.mark("models loaded"):
+            print(f"Startup: models loaded at {startup.marks['models loaded'] * 1000:.0f} ms")
 
     # Cleanup
+    profiler.cleanup()
     scene.cleanup()
-    if grid:
-        grid.cleanup()
-    if room:
-        room.cleanup()
+    environment.cleanup()
     pygame.quit()
     sys.exit(0)
 
-def draw_room(room, shader):
-    shader.use()
-    shader.set_mat4("model", identity())
-    shader.set_mat3("normalMatrix", np.eye(3, dtype=np.float32))
-    shader.set_vec3("objectColor", [0.92, 0.92, 0.90])
-    room.draw()
+def handle_input(input_handler, scene, profiler, dx, dy):
+    # Camera controls
+    if dx != 0 or dy != 0:
+        scene.camera.rotate(dx, -dy)
+    if input_handler.scroll_delta != 0:
+        scene.camera.zoom(input_handler.scroll_delta)
+
+    # Key events
+    for key in input_handler.key_events:
+        if key == pygame.K_ESCAPE:
+            input_handler.quit_requested = True
+        elif key == pygame.K_TAB:
+            scene.switch_model()
+        elif key == pygame.K_1:
+            scene.toggle_light_mode(scene.LIGHT_MODE_SUN)
+        elif key == pygame.K_2:
+            scene.toggle_light_mode(scene.LIGHT_MODE_SPOTLIGHTS)
+        elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            scene.sun.change_speed(10)
+            print(f"Sun speed: {scene.sun.speed:.0f} deg/s")
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            scene.sun.change_speed(-10)
+            print(f"Sun speed: {scene.sun.speed:.0f} deg/s")
+        elif key == pygame.K_SPACE:
+            scene.spotlights.add_spotlight(
+                scene.camera.position,
+                scene.camera.target,
+            )
+        elif key == pygame.K_c:
+            scene.spotlights.clear()
+        elif key == pygame.K_p:
+            if profiler.toggle():
+                print("Profiler: on")
+            else:
+                print(profiler.report())
+                print("Profiler: off")
+        elif key == pygame.K_t:
+            frames = profiler.export_chrome_trace(PROFILE_TRACE_PATH)
+            print(profiler.report())
+            print(f"Trace of {frames} frames written to {PROFILE_TRACE_PATH}")
+
+ROOM_COLOR = (0.92, 0.92, 0.90)
+
+def add_room(scene, room):
+    """Put the room in the scene graph and stand the statue on its pedestal."""
+    scene.graph.add(room, name="room", color=ROOM_COLOR)
+    scene.pedestal_top_y = room.pedestal_top_y
 
 def draw_grid(grid, grid_shader, scene, width, height):
-    aspect = width / height if height > 0 else 1.0
-    proj = perspective(45.0, aspect, 0.1, 100.0)
+    proj = scene.get_projection(width, height)
     view = scene.camera.get_view_matrix()
     grid_shader.use()
     grid_shader.set_mat4("projection", proj)
     grid_shader.set_mat4("view", view)
     grid.draw()
 
-def create_room():
-    return Room(size=6.0, height=4.0, pedestal_radius=1.0, pedestal_height=0.15)
+def load_shader(vertex_name, fragment_name, cache=None):
+    """Start building a program from shaders/; call finish() before using it."""
+    from engine.shader import Shader
+    return Shader(os.path.join(SHADERS_DIR, vertex_name), os.path.join(SHADERS_DIR, fragment_name),
+                  cache=cache, wait=False, hot_reload=SHADER_HOT_RELOAD)
+
+def create_shadow_maps(scene, shader_cache=None):
+    from engine.shadows import ShadowMaps
+    shader = load_shader("shadow_vertex.glsl", "shadow_fragment.glsl", shader_cache)
+    return ShadowMaps(shader, scene.light_buffer, size=SHADOW_MAP_SIZE, sun_angle_step=SHADOW_SUN_STEP,
+                      updates_per_frame=SHADOW_UPDATES_PER_FRAME)
+
+def create_gallery(num_models, geometry=None):
+    from engine.gallery import Gallery
+    return Gallery(num_models, pedestals=GALLERY_PEDESTALS, segments=PEDESTAL_SEGMENTS, geometry=geometry)
+
+def create_room(geometry=None):
+    from engine.room import Room
+    return Room(size=6.0, height=4.0, pedestal_radius=1.0, pedestal_height=0.15, segments=PEDESTAL_SEGMENTS,
+                geometry=geometry)
 
-def create_grid():
-    return Grid(size=8.0, y=-1.0)
+def create_grid(geometry=None):
+    from engine.grid import Grid
+    return Grid(size=8.0, y=-1.0, geometry=geometry)
 
 def choose_scenario():
     print("Escolha o cenário:")
     print("  1 - Room")
     print("  2 - Grid")
+    print("  3 - Galeria (todos os modelos)")
     while True:
-        choice = input("Digite 1 ou 2: ").strip()
-        if choice in ("1", "2"):
+        choice = input("Digite 1, 2 ou 3: ").strip()
+        if choice in ("1", "2", "3"):
             return int(choice)
         print("  Opção inválida, tente novamente.")
 
@@ -0,0 +1,136 @@
+"""Headless batch renderer: turntable PNG frames for every model, no window.
+
+Renders through EGL into an offscreen framebuffer, so it runs on machines
+without a display or GPU (Mesa llvmpipe). Models are distributed over a
+process pool; each worker owns one GL context.
+
+    python render_headless.py --frames 36 --size 512x512 --out renders
+"""
+import os
+
+# PyOpenGL chooses its platform on first import
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ.setdefault('EGL_PLATFORM', 'surfaceless')  # Mesa: no X11/Wayland needed
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pygame
+from OpenGL.GL import *
+
+from engine.offscreen import OffscreenTarget, create_egl_context
+from engine.scene import Scene
+from engine.shader import Shader
+from main import (MESH_CACHE_DIR, MODELS_DIR, SHADERS_DIR, add_room, create_grid, create_room,
+                  draw_grid, init_opengl)
+
+# Per-process GL state, created once by _init_worker
+_worker = {}
+
+
+def _init_worker(width, height, samples, scenario, models_dir, cache_dir, vertex_format):
+    create_egl_context()
+    init_opengl()
+    _worker.update(
+        width=width,
+        height=height,
+        models_dir=models_dir,
+        cache_dir=cache_dir,
+        vertex_format=vertex_format,
+        target=OffscreenTarget(width, height, samples),
+        model_shader=Shader(os.path.join(SHADERS_DIR, "vertex.glsl"),
+                            os.path.join(SHADERS_DIR, "fragment.glsl")),
+        grid_shader=Shader(os.path.join(SHADERS_DIR, "grid_vertex.glsl"),
+                           os.path.join(SHADERS_DIR, "grid_fragment.glsl")),
+        room=create_room() if scenario == "room" else None,
+        grid=create_grid() if scenario == "grid" else None,
+    )
+
+
+def render_turntable(fname, frames, out_dir, pitch, distance):
+    """Render `frames` evenly spaced yaw angles of one model; returns the PNG paths."""
+    w = _worker
+    width, height = w['width'], w['height']
+    scene = Scene(w['models_dir'], cache_dir=w['cache_dir'], load_workers=1, background_loading=False,
+                  vertex_format=w['vertex_format'])
+    scene.load_models(names=[fname])
+    scene.finish_loading()
+    if w['room']:
+        add_room(scene, w['room'])
+    scene.camera.pitch = pitch
+    scene.camera.distance = distance
+
+    name = scene.mesh_names[0]
+    model_dir = os.path.join(out_dir, name)
+    os.makedirs(model_dir, exist_ok=True)
+    paths = []
+    for k in range(frames):
+        scene.camera.yaw = -90.0 + 360.0 * k / frames
+        scene.update(0.0)
+        w['target'].bind()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        scene.render(w['model_shader'], width, height)
+        if w['grid']:
+            draw_grid(w['grid'], w['grid_shader'], scene, width, height)
+        path = os.path.join(model_dir, f"{name}_{k:03d}.png")
+        save_png(path, w['target'].read_rgb())
+        paths.append(path)
+    scene.cleanup()
+    return paths
+
+
+def save_png(path, pixels):
+    height, width = pixels.shape[:2]
+    surface = pygame.image.frombuffer(np.ascontiguousarray(pixels).tobytes(), (width, height), "RGB")
+    pygame.image.save(surface, path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render turntable frames of every model without a window.")
+    parser.add_argument("--models", default=MODELS_DIR, help="directory with .obj files")
+    parser.add_argument("--out", default="renders", help="output directory for PNG frames")
+    parser.add_argument("--frames", type=int, default=36, help="yaw angles per model")
+    parser.add_argument("--size", default="512x512", help="frame size, WIDTHxHEIGHT")
+    parser.add_argument("--samples", type=int, default=4, help="MSAA samples (1 disables)")
+    parser.add_argument("--scenario", choices=("room", "grid"), default="room")
+    parser.add_argument("--pitch", type=float, default=20.0)
+    parser.add_argument("--distance", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="render processes, one GL context each")
+    parser.add_argument("--vertex-format", choices=("float32", "compact"), default="float32")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the mesh cache")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    names = sorted(f for f in os.listdir(args.models) if f.endswith(".obj"))
+    if not names:
+        raise SystemExit(f"No .obj files found in {args.models}")
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    workers = max(1, min(args.workers, len(names)))
+    init_args = (width, height, args.samples, args.scenario, args.models,
+                 None if args.no_cache else MESH_CACHE_DIR, args.vertex_format)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=init_args) as pool:
+        futures = {pool.submit(render_turntable, name, args.frames, args.out, args.pitch, args.distance): name
+                   for name in names}
+        for future in as_completed(futures):
+            paths = future.result()
+            print(f"{futures[future]}: {len(paths)} frames -> {os.path.dirname(paths[0])}")
+
+    elapsed = time.perf_counter() - start
+    total = len(names) * args.frames
+    print(f"Rendered {total} frames of {len(names)} models in {elapsed:.1f}s with {workers} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,72 @@
 #version 330 core
 
-#define MAX_LIGHTS 10
+#define MAX_LIGHTS 240
+#define MAX_SHADOW_MAPS 10
 
+// std140 layout, mirrored by LIGHT_DTYPE in engine/light.py
 struct Light {
-    int type;       // 0 = directional (sun), 1 = point/spotlight
     vec3 position;
-    vec3 direction;
-    vec3 color;
     float intensity;
+    vec3 direction;
     float cutoff;       // for spotlight cone (cosine of angle)
+    vec3 color;
     float outerCutoff;
+    int type;           // 0 = directional (sun), 1 = point/spotlight
+    int shadowLayer;    // layer of shadowMaps, -1 = no shadow
+    float radius;       // point/spot: no light beyond this distance
+};
+
+layout(std140) uniform LightBlock {
+    Light lights[MAX_LIGHTS];
+    mat4 shadowMatrices[MAX_SHADOW_MAPS];  // world -> light clip space, per layer
+    int firstLight;
+    int numLights;
 };
 
-uniform int numLights;
-uniform Light lights[MAX_LIGHTS];
 uniform vec3 viewPos;
-uniform vec3 objectColor;
 uniform float ambientStrength;
+uniform sampler2DArrayShadow shadowMaps;  // engine/shadows.py
+
+// Clustered lighting (engine/clustering.py): the lights of each cluster of
+// the view frustum are listed in clusterLights, at the (offset, count) of
+// the cluster in clusterGrid. Off: every light of the active range.
+uniform bool clustered;
+uniform usamplerBuffer clusterGrid;
+uniform usamplerBuffer clusterLights;
+uniform ivec3 clusterCount;   // tiles across, tiles up, depth slices
+uniform vec2 clusterScale;    // tiles per pixel
+uniform vec2 clusterDepth;    // near plane, slices per log unit of depth
 
 in vec3 FragPos;
 in vec3 Normal;
+in vec3 Color;
+in float ViewDepth;
 
 out vec4 FragColor;
 
+// Fraction of the light reaching the fragment: 3x3 PCF over the light's
+// shadow map, looked up from slightly off the surface along the normal
+float calcShadow(Light light, vec3 normal, vec3 lightDir)
+{
+    if (light.shadowLayer < 0) {
+        return 1.0;
+    }
+    float slope = 1.0 - max(dot(normal, lightDir), 0.0);
+    vec4 clipPos = shadowMatrices[light.shadowLayer] * vec4(FragPos + normal * (0.005 + 0.02 * slope), 1.0);
+    vec3 coords = clipPos.xyz / clipPos.w * 0.5 + 0.5;
+    if (clipPos.w <= 0.0 || coords.z > 1.0) {
+        return 1.0;
+    }
+    vec2 texel = 1.0 / vec2(textureSize(shadowMaps, 0).xy);
+    float lit = 0.0;
+    for (int x = -1; x <= 1; x++) {
+        for (int y = -1; y <= 1; y++) {
+            lit += texture(shadowMaps, vec4(coords.xy + vec2(x, y) * texel, light.shadowLayer, coords.z));
+        }
+    }
+    return lit / 9.0;
+}
+
 vec3 calcDirectionalLight(Light light, vec3 normal, vec3 viewDir)
 {
     vec3 lightDir = normalize(-light.direction);
@@ -34,7 +78,7 @@ vec3 calcDirectionalLight(Light light, vec3 normal, vec3 viewDir)
 
     vec3 diffuse = diff * light.color * light.intensity;
     vec3 specular = spec * light.color * light.intensity * 0.5;
-    return diffuse + specular;
+    return (diffuse + specular) * calcShadow(light, normal, lightDir);
 }
 
 vec3 calcPointLight(Light light, vec3 normal, vec3 fragPos, vec3 viewDir)
@@ -42,6 +86,9 @@ vec3 calcPointLight(Light light, vec3 normal, vec3 fragPos, vec3 viewDir)
     vec3 lightDir = normalize(light.position - fragPos);
     float distance = length(light.position - fragPos);
     float attenuation = 1.0 / (1.0 + 0.09 * distance + 0.032 * distance * distance);
+    // Smooth falloff to zero at the radius the clusters were built with
+    float window = clamp(1.0 - pow(distance / light.radius, 4.0), 0.0, 1.0);
+    attenuation *= window * window;
 
     // Diffuse
     float diff = max(dot(normal, lightDir), 0.0);
@@ -59,7 +106,15 @@ vec3 calcPointLight(Light light, vec3 normal, vec3 fragPos, vec3 viewDir)
 
     vec3 diffuse = diff * light.color * intensity * attenuation;
     vec3 specular = spec * light.color * intensity * attenuation * 0.5;
-    return diffuse + specular;
+    return (diffuse + specular) * calcShadow(light, normal, lightDir);
+}
+
+vec3 calcLight(int i, vec3 normal, vec3 viewDir)
+{
+    if (lights[i].type == 0) {
+        return calcDirectionalLight(lights[i], normal, viewDir);
+    }
+    return calcPointLight(lights[i], normal, FragPos, viewDir);
 }
 
 void main()
@@ -72,14 +127,19 @@ void main()
 
     // Accumulate light contributions
     vec3 result = ambient;
-    for (int i = 0; i < numLights && i < MAX_LIGHTS; i++) {
-        if (lights[i].type == 0) {
-            result += calcDirectionalLight(lights[i], norm, viewDir);
-        } else {
-            result += calcPointLight(lights[i], norm, FragPos, viewDir);
+    if (clustered) {
+        ivec2 tile = min(ivec2(gl_FragCoord.xy * clusterScale), clusterCount.xy - 1);
+        int slice = clamp(int(log(ViewDepth / clusterDepth.x) * clusterDepth.y), 0, clusterCount.z - 1);
+        uvec2 range = texelFetch(clusterGrid, (slice * clusterCount.y + tile.y) * clusterCount.x + tile.x).rg;
+        for (uint k = 0u; k < range.y; k++) {
+            result += calcLight(int(texelFetch(clusterLights, int(range.x + k)).r), norm, viewDir);
+        }
+    } else {
+        for (int i = firstLight; i < firstLight + numLights && i < MAX_LIGHTS; i++) {
+            result += calcLight(i, norm, viewDir);
         }
     }
 
-    result *= objectColor;
+    result *= Color;
     FragColor = vec4(result, 1.0);
 }
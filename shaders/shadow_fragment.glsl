@@ -0,0 +1,6 @@
+#version 330 core
+
+// Only depth is written
+void main()
+{
+}
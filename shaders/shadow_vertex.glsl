@@ -0,0 +1,17 @@
+#version 330 core
+
+// Depth-only pass of engine/shadows.py; same attribute layout as vertex.glsl
+layout(location = 0) in vec3 aPos;
+layout(location = 2) in mat4 aInstanceModel;   // locations 2-5
+
+uniform mat4 model;
+uniform mat4 lightSpace;
+uniform bool instanced;
+uniform vec3 positionOffset;
+uniform vec3 positionScale;
+
+void main()
+{
+    mat4 world = instanced ? aInstanceModel : model;
+    gl_Position = lightSpace * world * vec4(positionOffset + positionScale * aPos, 1.0);
+}
@@ -2,18 +2,36 @@
 
 layout(location = 0) in vec3 aPos;
 layout(location = 1) in vec3 aNormal;
+// Per-instance attributes (divisor 1), laid out by engine/instancing.py;
+// used instead of the model/normalMatrix/objectColor uniforms when instanced
+layout(location = 2) in mat4 aInstanceModel;   // locations 2-5
+layout(location = 6) in mat3 aInstanceNormal;  // locations 6-8
+layout(location = 9) in vec3 aInstanceColor;
 
 uniform mat4 model;
 uniform mat4 view;
 uniform mat4 projection;
 uniform mat3 normalMatrix;
+uniform vec3 objectColor;
+uniform bool instanced;
+// Quantized positions: aPos holds integer steps across the mesh bounds
+// (float32 meshes and the room use offset 0, scale 1)
+uniform vec3 positionOffset;
+uniform vec3 positionScale;
 
 out vec3 FragPos;
 out vec3 Normal;
+out vec3 Color;
+out float ViewDepth;  // distance along the view axis, for the light clusters
 
 void main()
 {
-    FragPos = vec3(model * vec4(aPos, 1.0));
-    Normal = normalize(normalMatrix * aNormal);
-    gl_Position = projection * view * vec4(FragPos, 1.0);
+    mat4 world = instanced ? aInstanceModel : model;
+    mat3 normalWorld = instanced ? aInstanceNormal : normalMatrix;
+    Color = instanced ? aInstanceColor : objectColor;
+    FragPos = vec3(world * vec4(positionOffset + positionScale * aPos, 1.0));
+    Normal = normalize(normalWorld * aNormal);
+    vec4 viewPos = view * vec4(FragPos, 1.0);
+    ViewDepth = -viewPos.z;
+    gl_Position = projection * viewPos;
 }